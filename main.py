@@ -2,10 +2,16 @@
 
 import typer
 import asyncio
+import json
 
 from src.green_agent.agent import start_green_agent
 from src.white_agent.agent import start_white_agent
 from src.launcher import launch_evaluation, launch_remote_evaluation
+from src.tournament import run_tournament, print_leaderboard, FORMATS
+from src.match import run_match, load_openings, STOP_RULES
+from src.reanalysis import reanalyse, build_opening_index
+from src.benchmark import run_benchmark, print_report, measure_startup, STRATEGIES
+from src.my_util.analysis import compare_with_fixed_depth, parse_limit, ANALYSIS_LIMIT
 from pydantic_settings import BaseSettings
 
 
@@ -40,14 +46,128 @@ def run():
     return
 
 @app.command()
-def launch(local: bool = typer.Option(False, "--local", "-l")):
+def launch(
+    local: bool = typer.Option(False, "--local", "-l"),
+    stream: bool = typer.Option(False, "--stream", help="Print per-move updates as the game is played"),
+    games: int = typer.Option(1, "--games", "-n", help="Evaluations to run on the same warm agent processes"),
+):
     """Launch the complete evaluation workflow."""
-    asyncio.run(launch_evaluation(local=local))
+    asyncio.run(launch_evaluation(local=local, stream=stream, games=games))
 
 @app.command()
-def launch_remote(green_url: str, white_url_1: str, white_url_2: str):
+def launch_remote(
+    green_url: str,
+    white_url_1: str,
+    white_url_2: str,
+    stream: bool = typer.Option(False, "--stream", help="Print per-move updates as the game is played"),
+):
     """Launch the complete evaluation workflow."""
-    asyncio.run(launch_remote_evaluation(green_url, white_url_1, white_url_2))
+    asyncio.run(launch_remote_evaluation(green_url, white_url_1, white_url_2, stream=stream))
+
+@app.command()
+def tournament(
+    agent_urls: list[str],
+    format: str = typer.Option("round_robin", "--format", "-f", help=f"One of {', '.join(FORMATS)}"),
+    rounds: int = typer.Option(None, "--rounds", help="Number of Swiss rounds"),
+    concurrency: int = typer.Option(4, "--concurrency", "-c", help="Maximum games in flight"),
+    per_agent: int = typer.Option(1, "--per-agent", help="Maximum games in flight per agent"),
+):
+    """Play a tournament between white agents, running games concurrently."""
+    asyncio.run(run_tournament(agent_urls, format, rounds, concurrency, per_agent))
+
+@app.command()
+def match(
+    agent_a: str,
+    agent_b: str,
+    pairs: int = typer.Option(50, "--pairs", "-p", help="Maximum color-swapped game pairs"),
+    openings: str = typer.Option(None, "--openings", help="File with one starting FEN or EPD per line"),
+    stop: str = typer.Option("sprt", "--stop", help=f"One of {', '.join(STOP_RULES)}"),
+    elo0: float = typer.Option(0.0, "--elo0", help="SPRT null hypothesis: agent A is at most this much stronger"),
+    elo1: float = typer.Option(50.0, "--elo1", help="SPRT alternative: agent A is at least this much stronger"),
+    alpha: float = typer.Option(0.05, "--alpha"),
+    beta: float = typer.Option(0.05, "--beta"),
+    confidence: float = typer.Option(0.95, "--confidence", help="Confidence level for --stop ci"),
+    concurrency: int = typer.Option(1, "--concurrency", "-c", help="Game pairs in flight"),
+):
+    """Play a match between two white agents, stopping early once the result is decided."""
+    asyncio.run(run_match(
+        agent_a, agent_b, pairs, load_openings(openings) if openings else None, stop,
+        elo0, elo1, alpha, beta, confidence, concurrency,
+    ))
+
+@app.command()
+def leaderboard():
+    """Print ratings and running clp/accuracy statistics for every agent."""
+    asyncio.run(print_leaderboard())
+
+
+@app.command("reanalyse")
+def reanalyse_games(
+    source: str = typer.Argument(..., help="Directory of PGN files or gs://bucket/prefix"),
+    out_dir: str = typer.Option("reanalysis", "--out", "-o"),
+    depth: int = typer.Option(25, "--depth", "-d"),
+    nodes: int = typer.Option(None, "--nodes", help="Node budget per position instead of a fixed depth"),
+    workers: int = typer.Option(None, "--workers", "-w", help="Engine processes, defaults to the number of cores"),
+):
+    """Re-evaluate stored games on every core and write new eval histories and clp summaries."""
+    reanalyse(source, out_dir, depth=depth, nodes=nodes, workers=workers)
+
+
+@app.command("build_openings")
+def build_openings(
+    source: str = typer.Argument(..., help="PGN file, directory of PGN files, gs://bucket/prefix or JSON move tree"),
+    out: str = typer.Option("opening_index.bin", "--out", "-o"),
+    plies: int = typer.Option(10, "--plies", help="Index positions up to this many plies into each game"),
+    depth: int = typer.Option(20, "--depth", "-d"),
+    min_count: int = typer.Option(1, "--min-count", help="Only index positions reached in at least this many games"),
+    workers: int = typer.Option(None, "--workers", "-w", help="Engine processes, defaults to the number of cores"),
+):
+    """Build the memory-mapped opening evaluation index consulted before the engine."""
+    build_opening_index(source, out, plies=plies, depth=depth, min_count=min_count, workers=workers)
+
+
+@app.command("check_analysis")
+def check_analysis(
+    pgn_file: str = typer.Argument(..., help="PGN file with one or more games"),
+    limit: str = typer.Option(ANALYSIS_LIMIT, "--limit", help='Session limit, e.g. "nodes=300000"'),
+    depth: int = typer.Option(15, "--depth", "-d", help="Cold fixed depth to compare against"),
+    reference_depth: int = typer.Option(None, "--reference-depth", help="Deeper cold search to score both against"),
+):
+    """Compare per-game session analysis with cold fixed-depth analysis (speed and eval agreement)."""
+    with open(pgn_file, "r", encoding="utf-8") as f:
+        pgn_text = f.read()
+    report = asyncio.run(compare_with_fixed_depth(pgn_text, parse_limit(limit), depth, reference_depth))
+    print(json.dumps(report, indent=4))
+
+
+@app.command()
+def bench(
+    games: int = typer.Option(4, "--games", "-n"),
+    concurrency: int = typer.Option(2, "--concurrency", "-c"),
+    strategy: str = typer.Option("random", "--strategy", help=f"One of {', '.join(STRATEGIES)}"),
+    latency: float = typer.Option(0.0, "--latency", help="Seconds each stand-in agent waits before answering"),
+    jitter: float = typer.Option(0.0, "--jitter", help="Random +/- spread on the latency"),
+    port: int = typer.Option(9102, "--port", help="First of two ports for the stand-in agents"),
+    storage_dir: str = typer.Option(None, "--storage-dir", help="Local storage directory, defaults to a temp dir"),
+    out: str = typer.Option(None, "--out", "-o", help="Also write the report as JSON"),
+):
+    """Benchmark green agent throughput offline against stand-in white agents."""
+    report = asyncio.run(run_benchmark(games, concurrency, strategy, latency, jitter, port=port,
+                                       storage_dir=storage_dir))
+    print_report(report)
+    if out:
+        with open(out, "w") as f:
+            json.dump(report, f, indent=4)
+
+
+@app.command()
+def startup(
+    role: str = typer.Option("green", "--role", help="green or white"),
+    runs: int = typer.Option(3, "--runs", "-n"),
+    port: int = typer.Option(9601, "--port"),
+):
+    """Measure agent cold start: module import time and time until the agent card is served."""
+    print(json.dumps(asyncio.run(measure_startup(role, runs, port=port)), indent=4))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,181 @@
+"""Offline throughput benchmark: the green agent against local stand-in white agents."""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uvicorn
+from a2a.server.apps import A2AStarletteApplication
+from a2a.server.request_handlers import DefaultRequestHandler
+from a2a.server.agent_execution import AgentExecutor, RequestContext
+from a2a.server.events import EventQueue
+from a2a.server.tasks import InMemoryTaskStore, TaskUpdater
+from a2a.utils import new_agent_text_message
+from src.my_util import my_a2a, utils
+from src.my_util.artifact_store import LocalBackend, set_storage_backend
+from src.my_util.eval_cache import get_eval_cache
+from src.my_util.timing import get_timings
+from src.green_agent.agent import ask_agent_to_solve
+from src.green_agent.prompt import parse_legal_moves, PROMPT_MOVE_ENCODING
+from src.white_agent.agent import prepare_white_agent_card, is_game_over
+
+# random: a uniformly random legal move; first: always the first legal move listed.
+STRATEGIES = ("random", "first")
+
+
+class StandInWhiteAgentExecutor(AgentExecutor):
+    """Answers every move prompt with a legal move after an artificial delay."""
+
+    def __init__(self, strategy="random", latency=0.0, jitter=0.0, seed=None, encoding=PROMPT_MOVE_ENCODING):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy: {strategy}")
+        self.strategy = strategy
+        self.latency = latency
+        self.jitter = jitter
+        self.encoding = encoding
+        self.rng = random.Random(seed)
+
+    async def execute(self, context: RequestContext, event_queue: EventQueue) -> None:
+        if is_game_over(context.message):
+            await event_queue.enqueue_event(new_agent_text_message("Game over.", context_id=context.context_id))
+            return
+        delay = self.latency + self.rng.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        answers = parse_legal_moves(context.get_user_input(), self.encoding)
+        answer = answers[0] if self.strategy == "first" else self.rng.choice(answers)
+        await event_queue.enqueue_event(
+            new_agent_text_message(f"Final Answer: {answer}", context_id=context.context_id)
+        )
+
+    async def cancel(self, context, event_queue) -> None:
+        # Moves are answered straight away, so there is nothing to stop.
+        await TaskUpdater(event_queue, context.task_id, context.context_id).cancel()
+
+
+def start_stand_in_agent(host="localhost", port=9102, strategy="random", latency=0.0, jitter=0.0, seed=None):
+    card = prepare_white_agent_card(f"http://{host}:{port}")
+    request_handler = DefaultRequestHandler(
+        agent_executor=StandInWhiteAgentExecutor(strategy, latency, jitter, seed),
+        task_store=InMemoryTaskStore(),
+    )
+    app = A2AStarletteApplication(agent_card=card, http_handler=request_handler)
+    uvicorn.run(app.build(), host=host, port=port, log_level="warning")
+
+
+async def run_benchmark(games=4, concurrency=2, strategy="random", latency=0.0, jitter=0.0,
+                        host="localhost", port=9102, storage_dir=None, seed=0):
+    """Play `games` games, `concurrency` at a time, and return throughput and per-phase latencies.
+
+    Games are run by calling the green agent's game loop in this process, not through
+    its A2A endpoint, so the green agent's own request handling is not measured.
+    """
+    storage_dir = storage_dir or tempfile.mkdtemp(prefix="chess_bench_")
+    set_storage_backend(LocalBackend(storage_dir))
+
+    processes = []
+    urls = []
+    for i in range(2):
+        agent_seed = None if seed is None else seed + i
+        process = multiprocessing.Process(
+            target=start_stand_in_agent, args=(host, port + i, strategy, latency, jitter, agent_seed)
+        )
+        process.start()
+        processes.append(process)
+        urls.append(f"http://{host}:{port + i}")
+
+    timings = get_timings()
+    timings.reset()
+    slots = asyncio.Semaphore(concurrency)
+    failures = []
+
+    async def play(index):
+        white, black = urls if index % 2 == 0 else urls[::-1]
+        async with slots:
+            try:
+                await ask_agent_to_solve(white, black, test_mode=False)
+            except Exception as e:
+                failures.append(repr(e))
+
+    try:
+        ready = await my_a2a.wait_agents_ready(urls)
+        assert all(ready.values()), f"Stand-in agents not ready in time: {ready}"
+        start = time.perf_counter()
+        await asyncio.gather(*(play(i) for i in range(games)))
+        elapsed = time.perf_counter() - start
+    finally:
+        for process in processes:
+            process.terminate()
+            process.join()
+        await utils.close_engine_pool()
+
+    phases = timings.summary()
+    completed = games - len(failures)
+    return {
+        "games": games,
+        "completed": completed,
+        "failures": failures,
+        "concurrency": concurrency,
+        "strategy": strategy,
+        "latency": latency,
+        "seconds": round(elapsed, 3),
+        "games_per_sec": round(completed / elapsed, 4) if elapsed else None,
+        "moves_per_sec": round(phases.get("move", {}).get("count", 0) / elapsed, 3) if elapsed else None,
+        "eval_cache": get_eval_cache().stats(),
+        "storage_dir": storage_dir,
+        "phases": phases,
+    }
+
+
+def _import_seconds(module):
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+async def _card_seconds(role, host, port):
+    env = dict(os.environ, ROLE=role, HOST=host, AGENT_PORT=str(port), AGENT_URL=f"http://{host}:{port}")
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "main.py", "run"], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        ready = await my_a2a.wait_agent_ready(f"http://{host}:{port}", interval=0.01)
+        return time.perf_counter() - started if ready else None
+    finally:
+        process.terminate()
+        process.wait()
+
+
+async def measure_startup(role="green", runs=3, host="localhost", port=9601):
+    """Cold-start times of an agent: module import, and process start until the agent card is served."""
+    module = "src.green_agent.agent" if role == "green" else "src.white_agent.agent"
+    imports = [_import_seconds(module) for _ in range(runs)]
+    cards = [await _card_seconds(role, host, port) for _ in range(runs)]
+    return {
+        "role": role,
+        "runs": runs,
+        "import_seconds": {"min": round(min(imports), 3), "mean": round(sum(imports) / runs, 3)},
+        "agent_card_seconds": {
+            "min": round(min(c for c in cards if c is not None), 3) if any(c is not None for c in cards) else None,
+            "mean": round(sum(cards) / runs, 3) if None not in cards else None,
+            "failed": cards.count(None),
+        },
+    }
+
+
+def print_report(report):
+    print(f"{report['completed']}/{report['games']} games in {report['seconds']}s "
+          f"at concurrency {report['concurrency']}: {report['games_per_sec']} games/sec, "
+          f"{report['moves_per_sec']} moves/sec")
+    print(f"{'phase':<10} {'count':>7} {'mean ms':>10} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+    for phase, stats in report["phases"].items():
+        print(f"{phase:<10} {stats['count']:>7} {stats['mean_ms']:>10} {stats['p50_ms']:>10} "
+              f"{stats['p95_ms']:>10} {stats['p99_ms']:>10}")
+    for failure in report["failures"]:
+        print(f"Failed game: {failure}")
+    print(json.dumps(report["eval_cache"]))
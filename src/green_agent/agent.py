@@ -7,22 +7,32 @@ import json
 import time
 import os
 import datetime as dt
-import numpy as np
+import asyncio
+import contextlib
+import chess
 from a2a.server.apps import A2AStarletteApplication
 from a2a.server.request_handlers import DefaultRequestHandler
 from a2a.server.agent_execution import AgentExecutor, RequestContext
 from a2a.server.events import EventQueue
 from a2a.server.tasks import InMemoryTaskStore
-from a2a.types import AgentCard, SendMessageSuccessResponse, Message
-from a2a.utils import new_agent_text_message, get_text_parts
+from a2a.server.tasks import TaskUpdater
+from a2a.types import AgentCard, SendMessageSuccessResponse, Message, TaskState, Part, DataPart
+from a2a.utils import new_agent_text_message, new_task, get_text_parts
 from src.my_util import parse_tags, my_a2a
-from src.my_util.utils import save_state_to_gcs, save_pgn_to_gcs, load_state_from_gcs, GAME_FILE, GAME_DATA_FILE, PLAYER_DATA_FILE, GAME_EVAL_FILE
+from src.my_util.utils import GAME_FILE
+from src.my_util.rating_store import get_rating_store, atomic_update_json
+from src.my_util.stats import game_metrics, update_aggregates, public_metrics
+from src.my_util.artifact_store import get_storage_backend, JSON_CONTENT_TYPE, PGN_CONTENT_TYPE
+from src.my_util.eval_cache import get_eval_cache
+from src.my_util.metrics import metrics_routes, GAMES_STARTED, GAMES_FINISHED, GAMES_IN_PROGRESS
+from src.my_util.analysis import AnalysisSession
 from src.green_agent.green_agent_wrapper import GreenAgent
+from src.green_agent.session import open_session, close_session, get_session, session_routes
 
 dotenv.load_dotenv()
 
-ELO_OBJECT_NAME="elo_ratings.json"
-DEFAULT_ELO=1000
+PLAYER_STATS_OBJECT_NAME="player_stats.json"
+ENGINE_WARMUP = os.getenv("ENGINE_WARMUP", "true").lower() == "true"
 
 def load_agent_card_toml(agent_name):
     current_dir = __file__.rsplit("/", 1)[0]
@@ -30,43 +40,100 @@ def load_agent_card_toml(agent_name):
         return tomllib.load(f)
 
 
-async def ask_agent_to_solve(white_agent_url_1, white_agent_url_2):
+async def warm_up_engine():
+    """Start an engine and evaluate the start position, so the first game does not wait for it."""
+    started = time.perf_counter()
+    try:
+        await AnalysisSession().analyse(chess.Board())
+        print(f"Engine warmed up in {time.perf_counter() - started:.2f}s")
+    except Exception as e:
+        print(f"Engine warm-up failed: {e}")
+
+
+@contextlib.asynccontextmanager
+async def warm_up_lifespan(app):
+    # The agent card is served while the engine starts in the background.
+    task = asyncio.create_task(warm_up_engine()) if ENGINE_WARMUP else None
+    yield
+    if task is not None:
+        task.cancel()
+
+
+async def ask_agent_to_solve(white_agent_url_1, white_agent_url_2, on_move=None, session=None, start_fen=None,
+                             test_mode=None):
     # Here, instead of calling white agent like calling an LLM, we need to present
     #   the assessment scenario to the white agent as if it is a independent task
     # Specifically, here we provide the tool information for the agent to reply with
-    green_agent = GreenAgent()
+    owns_session = session is None
+    if owns_session:
+        session = open_session(white_url=white_agent_url_1, black_url=white_agent_url_2)
+    try:
+        return await _play_session(session, white_agent_url_1, white_agent_url_2, on_move, start_fen, test_mode)
+    finally:
+        if owns_session:
+            close_session(session.id)
+
+
+async def _play_session(session, white_agent_url_1, white_agent_url_2, on_move, start_fen, test_mode):
+    green_agent = GreenAgent(on_move=on_move, output_dir=session.output_dir, start_fen=start_fen, test_mode=test_mode)
+    session.green_agent = green_agent
     green_agent.register_agent("White", white_agent_url_1)
     green_agent.register_agent("Black", white_agent_url_2)
     is_retry = False
-    while green_agent.check_game_over() is False:
-        try:
-            cur_result = await green_agent.execute(green_agent.pyspiel_state, is_retry)
-            is_retry = False
-            print(cur_result)
-        except Exception as e:
-            is_retry = True
-            print("Illegal move made, try again", e)
+    GAMES_STARTED.inc()
+    GAMES_IN_PROGRESS.inc()
+    try:
+        while green_agent.check_game_over() is False:
+            try:
+                cur_result = await green_agent.execute(green_agent.pyspiel_state, is_retry)
+                is_retry = False
+                print(cur_result)
+            except Exception as e:
+                is_retry = True
+                print("Illegal move made, try again", e)
+                green_agent.record_failed_attempt()
+        await green_agent.finish()
+    except asyncio.CancelledError:
+        print("Game cancelled, aborting...")
+        session.status = "aborted"
+        await green_agent.abort()
+        raise
+    except Exception:
+        session.status = "failed"
+        await green_agent.abort()
+        raise
+    finally:
+        GAMES_IN_PROGRESS.dec()
+        await green_agent.end_conversations()
+        await green_agent.a2a.aclose()
+    session.status = "finished"
+    GAMES_FINISHED.inc(result=green_agent.record.result)
     game_result = green_agent.get_game_result()
+    print(f"Eval cache stats: {get_eval_cache().stats()}")
     
-    agent_elo = load_state_from_gcs(ELO_OBJECT_NAME)
-    if agent_elo is None:
-        agent_elo = {}
-
-    white_agent_1_elo = agent_elo.get(white_agent_url_1, DEFAULT_ELO)
-    white_agent_2_elo = agent_elo.get(white_agent_url_2, DEFAULT_ELO)
+    def apply_result(white_agent_1_elo, white_agent_2_elo):
+        white_agent_new_elo1 = green_agent.calculate_elo(white_agent_1_elo, white_agent_2_elo, game_result[0])
+        white_agent_new_elo2 = green_agent.calculate_elo(white_agent_2_elo, white_agent_1_elo, game_result[1])
+        return white_agent_new_elo1, white_agent_new_elo2
+
+    metrics = game_metrics(green_agent.eval_history, green_agent.first_player)
+    players = {"White": white_agent_url_1, "Black": white_agent_url_2}
+    upload_started = time.perf_counter()
+    # The rating update and the uploads are independent storage round-trips, so they run together.
+    agent_elo, _, _ = await asyncio.gather(
+        get_rating_store().update_pair(white_agent_url_1, white_agent_url_2, apply_result),
+        store_files(white_agent_url_1, white_agent_url_2, green_agent.artifacts),
+        asyncio.to_thread(
+            atomic_update_json, get_storage_backend(), PLAYER_STATS_OBJECT_NAME,
+            lambda document: update_aggregates(document, players, metrics),
+        ),
+    )
+    green_agent.timings.add("upload", time.perf_counter() - upload_started)
 
-    white_agent_new_elo1 = green_agent.calculate_elo(white_agent_1_elo, white_agent_2_elo, game_result[0])
-    white_agent_new_elo2 = green_agent.calculate_elo(white_agent_2_elo, white_agent_1_elo, game_result[1])
-    
     print(f'Game result: {game_result}')
-    print(f'Adjusted elos: {white_agent_new_elo1}, {white_agent_new_elo2}')
-    agent_elo[white_agent_url_1] = white_agent_new_elo1
-    agent_elo[white_agent_url_2] = white_agent_new_elo2
-    save_state_to_gcs(agent_elo, ELO_OBJECT_NAME)
-
-    store_files(white_agent_url_1, white_agent_url_2)
+    print(f'Adjusted elos: {agent_elo[white_agent_url_1]}, {agent_elo[white_agent_url_2]}')
 
-    return game_result, agent_elo, green_agent.player_eval
+    return game_result, agent_elo, metrics
 
 
 class ChessGreenAgentExecutor(AgentExecutor):
@@ -80,53 +147,76 @@ class ChessGreenAgentExecutor(AgentExecutor):
         tags = parse_tags(user_input)
         white_agent_url_1 = tags["white_agent_url"][0]
         white_agent_url_2 = tags["white_agent_url"][1]
+        # Optional starting position, e.g. an opening from a match's book.
+        start_fen = tags.get("start_fen", [None])[0]
         # env_config_str = tags["env_config"][0]
         # env_config = json.loads(env_config_str)
 
         # set up the environment
         print("Green agent: Setting up the environment...")
         metrics = {white_agent_url_1: {}, white_agent_url_2: {}}
+        task = context.current_task
+        if task is None:
+            task = new_task(context.message)
+            await event_queue.enqueue_event(task)
+        updater = TaskUpdater(event_queue, task.id, task.context_id)
+        try:
+            session = open_session(task.id, white_agent_url_1, white_agent_url_2)
+        except ValueError as e:
+            await updater.failed(new_agent_text_message(str(e), task.context_id, task.id))
+            return
+
+        async def report_move(update):
+            # Streamed to the caller as a working status update after every evaluated move.
+            # The move goes in the update's metadata rather than a status message: status
+            # messages are appended to the task's history, which the task store keeps.
+            await updater.update_status(TaskState.working, metadata={"move": update})
 
         print("Green agent: Starting evaluation...")
+        await updater.start_work(new_agent_text_message("Game started.", task.context_id, task.id))
         timestamp_started = time.time()
-        game_res, elo, res = await ask_agent_to_solve(white_agent_url_1, white_agent_url_2)
+        try:
+            game_res, elo, res = await ask_agent_to_solve(
+                white_agent_url_1, white_agent_url_2, on_move=report_move, session=session, start_fen=start_fen
+            )
+        except asyncio.CancelledError:
+            # Sent to the caller's stream, and from there to the cancel request's.
+            await updater.cancel(new_agent_text_message("Game aborted.", task.context_id, task.id))
+            raise
+        except Exception as e:
+            print(f"Green agent: Game failed: {e}")
+            await updater.failed(new_agent_text_message(f"Game failed: {e}", task.context_id, task.id))
+            return
+        finally:
+            close_session(session.id)
 
         metrics["elapsed_time"] = time.time() - timestamp_started
         metrics["game_result"] = game_res
 
         metrics[white_agent_url_1]["elo"] = elo[white_agent_url_1]
-        metrics[white_agent_url_1]["clp"] = float(np.mean(res["White"]["Overall"])) if res["White"]["Overall"] else None
-        metrics[white_agent_url_1]["clp_equal"] = float(np.mean(res["White"]["Equal"])) if res["White"]["Equal"] else None
-        metrics[white_agent_url_1]["clp_winning"] = float(np.mean(res["White"]["Winning"])) if res["White"]["Winning"] else None
-        metrics[white_agent_url_1]["clp_losing"] = float(np.mean(res["White"]["Losing"])) if res["White"]["Losing"] else None
+        metrics[white_agent_url_1].update(public_metrics(res["White"]))
 
         metrics[white_agent_url_2]["elo"] = elo[white_agent_url_2]
-        metrics[white_agent_url_2]["clp"] = float(np.mean(res["Black"]["Overall"])) if res["Black"]["Overall"] else None
-        metrics[white_agent_url_2]["clp_equal"] = float(np.mean(res["Black"]["Equal"])) if res["Black"]["Equal"] else None
-        metrics[white_agent_url_2]["clp_winning"] = float(np.mean(res["Black"]["Winning"])) if res["Black"]["Winning"] else None
-        metrics[white_agent_url_2]["clp_losing"] = float(np.mean(res["Black"]["Losing"])) if res["Black"]["Losing"] else None
+        metrics[white_agent_url_2].update(public_metrics(res["Black"]))
 
         print("Green agent: Evaluation complete")
-        print("Printing out game file:")
-        try:
-            with open(GAME_FILE, "r") as f:
-                print(f.read())
-        except FileNotFoundError:
-            print(f"{GAME_FILE} not found.")
-        except Exception as e:
-            print(f"Failed to read {GAME_FILE}: {e}")
+        print(f"Printing out game file (also written to {session.output_dir}):")
+        print(session.pgn())
 
         print("\nPrinting out metrics:")
         print(metrics)
 
-        await event_queue.enqueue_event(
-            new_agent_text_message(
-                f"Finished. Metrics: {metrics}\n"
-            )
+        await updater.add_artifact([Part(root=DataPart(data=json.loads(json.dumps(metrics))))], name="metrics")
+        await updater.complete(
+            new_agent_text_message(f"Finished. Metrics: {metrics}\n", task.context_id, task.id)
         )
 
     async def cancel(self, context: RequestContext, event_queue: EventQueue) -> None:
-        raise NotImplementedError
+        # The request handler cancels the running execute() call, which aborts the game
+        # and reports the cancellation. Only a task with no game running is cancelled here.
+        if get_session(context.task_id) is None:
+            updater = TaskUpdater(event_queue, context.task_id, context.context_id)
+            await updater.cancel(new_agent_text_message("Game aborted.", context.context_id, context.task_id))
 
 
 def start_green_agent(agent_name="chess_green_agent", host="localhost", port=9001, local=False):
@@ -152,7 +242,7 @@ def start_green_agent(agent_name="chess_green_agent", host="localhost", port=900
         http_handler=request_handler,
     )
 
-    uvicorn.run(app.build(), host=host, port=port)
+    uvicorn.run(app.build(routes=metrics_routes() + session_routes(), lifespan=warm_up_lifespan), host=host, port=port)
 
 def clean_url(str):
     return (
@@ -162,35 +252,15 @@ def clean_url(str):
             .replace("&", "_")
     )
 
-def store_files(white_url_1, white_url_2):
+async def store_files(white_url_1, white_url_2, artifacts):
     now = dt.datetime.now(dt.timezone.utc)
     timestamp = now.strftime("%Y%m%dT%H%M%S%fZ")
     game_string = clean_url(f'{white_url_1}_vs_{white_url_2}_{timestamp}')
 
-    try:
-        with open(GAME_FILE, "r", encoding="utf-8") as f:
-            pgn_text = f.read()
-    except:
-        pgn_text = ""
-    save_pgn_to_gcs(pgn_text, f"{game_string}_{GAME_FILE}")
-
-    try:
-        with open(GAME_DATA_FILE, "r") as f:
-            game_data = json.load(f)
-    except:
-        game_data = {}
-    save_state_to_gcs(game_data, f"{game_string}_{GAME_DATA_FILE}")
-
-    try:
-        with open(PLAYER_DATA_FILE, "r") as f:
-            player_data = json.load(f)
-    except:
-        player_data = {}
-    save_state_to_gcs(player_data, f"{game_string}_{PLAYER_DATA_FILE}")
-
-    try:
-        with open(GAME_EVAL_FILE, "r") as f:
-            game_eval = json.load(f)
-    except:
-        game_eval = {}
-    save_state_to_gcs(game_eval, f"{game_string}_{GAME_EVAL_FILE}")
+    objects = {}
+    for file_name, content in artifacts.items():
+        if file_name == GAME_FILE:
+            objects[f"{game_string}_{file_name}"] = (content, PGN_CONTENT_TYPE)
+        else:
+            objects[f"{game_string}_{file_name}"] = (json.dumps(content), JSON_CONTENT_TYPE)
+    await get_storage_backend().upload_many(objects)
@@ -0,0 +1,61 @@
+"""Chess clock and per-move limits enforced by the green agent."""
+
+import os
+import time
+
+CLOCK_BASE_SECONDS = float(os.getenv("CLOCK_BASE_SECONDS", "3600"))
+CLOCK_INCREMENT_SECONDS = float(os.getenv("CLOCK_INCREMENT_SECONDS", "0"))
+MOVE_DEADLINE_SECONDS = float(os.getenv("MOVE_DEADLINE_SECONDS", "300"))
+MAX_ILLEGAL_RETRIES = int(os.getenv("MAX_ILLEGAL_RETRIES", "5"))
+
+
+class ChessClock:
+    """Fischer clock: each side starts with `base` seconds and gains `increment` per move played.
+
+    Only one side's clock runs at a time. Time spent on rejected attempts is charged,
+    but the increment is only added once a move is accepted.
+    """
+
+    def __init__(self, base=CLOCK_BASE_SECONDS, increment=CLOCK_INCREMENT_SECONDS,
+                 move_deadline=MOVE_DEADLINE_SECONDS):
+        self.increment = increment
+        self.move_deadline = move_deadline
+        self.remaining = {"White": base, "Black": base}
+        self.move_time = {"White": 0.0, "Black": 0.0}
+        self._running = None
+        self._started_at = None
+
+    def start(self, player):
+        self.stop()
+        self._running = player
+        self._started_at = time.monotonic()
+
+    def stop(self):
+        """Stop the running clock and return the seconds charged to it."""
+        if self._running is None:
+            return 0.0
+        elapsed = time.monotonic() - self._started_at
+        self.remaining[self._running] -= elapsed
+        self.move_time[self._running] += elapsed
+        self._running = None
+        return elapsed
+
+    def time_left(self, player):
+        left = self.remaining[player]
+        if self._running == player:
+            left -= time.monotonic() - self._started_at
+        return left
+
+    def move_budget(self, player):
+        """Seconds the player may still use on the current move, across all attempts."""
+        return max(0.0, min(self.move_deadline - self.move_time[player], self.time_left(player)))
+
+    def flagged(self, player):
+        return self.time_left(player) <= 0
+
+    def complete_move(self, player):
+        """Add the increment and return the total time the player spent on the move."""
+        self.stop()
+        self.remaining[player] += self.increment
+        used, self.move_time[player] = self.move_time[player], 0.0
+        return used
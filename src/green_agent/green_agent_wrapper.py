@@ -1,35 +1,80 @@
 import asyncio
+import functools
 import pyspiel
 from src.my_util import utils
+from src.my_util.game_record import GameRecord
+from src.my_util.journal import GameJournal, write_artifacts
+from src.my_util.analysis import AnalysisSession
+from src.my_util.timing import get_timings
+from src.my_util.metrics import MOVES, ILLEGAL_ATTEMPTS, FORFEITS
+from src.my_util.stats import RunningStats, move_metrics
+from src.green_agent.prompt import PromptBuilder, prompt_size
+from src.green_agent.clock import ChessClock, MAX_ILLEGAL_RETRIES
 import json
-import re
 import os
-from a2a.types import SendMessageSuccessResponse, Message
+import time
+from a2a.client import A2AClientTimeoutError
 from a2a.utils import get_text_parts
 from src.my_util import my_a2a
-from src.my_util.utils import GAME_FILE, GAME_DATA_FILE, PLAYER_DATA_FILE, GAME_EVAL_FILE
 
-from google.cloud import storage
+
+GAME_OVER_TIMEOUT = float(os.getenv("GAME_OVER_TIMEOUT", "2"))
+
+@functools.lru_cache(maxsize=None)
+def load_test_case(test_index):
+    with open(f'test_cases/test_case_{test_index}.json', 'r') as f:
+        return json.load(f)
+
 
 class GreenAgent:
     
-    def __init__(self, test_index=None):
+    def __init__(self, test_index=None, clock=None, max_retries=MAX_ILLEGAL_RETRIES, on_move=None, output_dir=".",
+                 start_fen=None, test_mode=None):
         self.game = pyspiel.load_game("chess")
-        self.pyspiel_state = self.game.new_initial_state()
+        # Games normally start from the initial position; matches may start from an opening FEN.
+        self.pyspiel_state = self.game.new_initial_state(start_fen) if start_fen else self.game.new_initial_state()
+        self.record = GameRecord(fen=start_fen)
+        self.first_player = self.to_play()
+        self.prompt_builder = PromptBuilder()
         self.agents = {}
-        self.game_data = {}
-        initial_eval = utils.get_engine_eval(self.pyspiel_state.to_string())
-        self.eval_history = [initial_eval]
-        self.player_eval = {"White": {"Overall": [], "Equal": [], "Winning": [], "Losing": []}, "Black": {"Overall": [], "Equal": [], "Winning": [], "Losing": []}}
+        self.a2a = my_a2a.A2AClientManager()
+        # Journal and game files go to a directory of their own, so concurrent games don't share files.
+        self.output_dir = output_dir
+        os.makedirs(output_dir, exist_ok=True)
+        self.journal = GameJournal(os.path.join(output_dir, utils.GAME_JOURNAL_FILE))
+        self.journal.append({"type": "header", "headers": dict(self.record.headers)})
+        self.eval_history = []
+        self.artifacts = None
+        self.clock = clock or ChessClock()
+        self.max_retries = max_retries
+        self.failed_attempts = 0
+        # Set when a game ends by forfeit rather than on the board.
+        self.forfeit_result = None
+        # Engine evaluations run in the background; each task awaits its predecessor
+        # before recording, so results land in move order.
+        self._eval_task = None
+        # Every evaluation not finished yet, so an aborted game can cancel them all.
+        self._eval_tasks = set()
+        self.timings = get_timings()
+        self.analysis = AnalysisSession(timings=self.timings)
+        self._move_started = None
+        # Optional async callback, awaited with a progress dict once each move is evaluated.
+        self.on_move = on_move
+        self.running = {player: {"cpl": RunningStats(), "accuracy": RunningStats()} for player in ("White", "Black")}
+        # Test mode plays the predefined moves of test case TEST_INDEX instead of asking the agents.
+        if test_mode is None:
+            test_mode = os.getenv("TEST_MODE", "false").lower() == "true"
+        self.test_mode = test_mode
     
     def register_agent(self, player, agent):
         self.agents[player] = agent
         self.agents[f'{player}_context_id'] = None
 
-    async def send_message_to_agent(self, player, message=None):
+    async def send_message_to_agent(self, player, message=None, metadata=None, timeout=None):
         context_id_str = f'{player}_context_id'
-        white_agent_response = await my_a2a.send_message(
-            self.agents[player], message, context_id=self.agents[context_id_str]
+        white_agent_response = await self.a2a.send_message(
+            self.agents[player], message, context_id=self.agents[context_id_str], cur_timeout=timeout,
+            metadata=metadata,
         )
         res_root = white_agent_response.root
         res_result = res_root.result
@@ -48,9 +93,55 @@ class GreenAgent:
 
         return white_text
 
+    async def end_conversations(self):
+        """Tell each agent that advertises the game-over extension that the game is over, so it can
+        drop the game's conversation. Best effort: a slow agent is given up on after GAME_OVER_TIMEOUT."""
+        async def send(player, context_id):
+            card = await self.a2a.get_agent_card(self.agents[player])
+            if not my_a2a.supports_extension(card, my_a2a.GAME_OVER_EXTENSION):
+                return
+            await self.a2a.send_message(
+                self.agents[player], f"The game is over: {self.record.result}", context_id=context_id,
+                cur_timeout=GAME_OVER_TIMEOUT, metadata={"game_over": True},
+            )
+
+        async def notify(player):
+            context_id = self.agents.get(f'{player}_context_id')
+            if context_id is None:
+                return
+            try:
+                await asyncio.wait_for(send(player, context_id), timeout=GAME_OVER_TIMEOUT)
+            except Exception as e:
+                print(f"Failed to tell {player} the game is over: {e}")
+
+        await asyncio.gather(notify("White"), notify("Black"))
+
+    def to_play(self):
+        return 'White' if self.pyspiel_state.current_player() == 1 else 'Black'
+
     def check_game_over(self):
-        return self.pyspiel_state.is_terminal()
+        return self.forfeit_result is not None or self.pyspiel_state.is_terminal()
+
+    def forfeit(self, player, reason):
+        """End the game as a loss for `player`."""
+        print(f"{player} forfeits: {reason}")
+        FORFEITS.inc(reason=reason)
+        self.clock.stop()
+        self.forfeit_result = [0, 1] if player == "White" else [1, 0]
+        self.record.set_result("0-1" if player == "White" else "1-0", reason)
+
+    def record_failed_attempt(self):
+        """Count a rejected move; forfeit once the retry budget is used up. Returns True on forfeit."""
+        self.failed_attempts += 1
+        ILLEGAL_ATTEMPTS.inc()
+        if self.failed_attempts > self.max_retries:
+            self.forfeit(self.to_play(), "too many illegal moves")
+            return True
+        return False
+
     def get_game_result(self):
+        if self.forfeit_result is not None:
+            return list(self.forfeit_result)
         result = self.pyspiel_state.returns()
         for i in range(len(result)):
             if result[i] == 0:
@@ -65,107 +156,156 @@ class GreenAgent:
         new_player1_elo = player1_elo + K * (result - expected_score)
         return new_player1_elo
 
+    def _schedule_eval(self, board, on_result):
+        prev_task = self._eval_task
+        self._eval_task = asyncio.create_task(self._evaluate(prev_task, board, on_result))
+        self._eval_tasks.add(self._eval_task)
+        self._eval_task.add_done_callback(self._eval_tasks.discard)
+
+    async def _evaluate(self, prev_task, board, on_result):
+        move_eval = await self.analysis.analyse(board)
+        if prev_task is not None:
+            await prev_task
+        update = on_result(move_eval)
+        if update is not None and self.on_move is not None:
+            try:
+                await self.on_move(update)
+            except Exception as e:
+                print(f"Failed to report move progress: {e}")
+
+    async def wait_for_evals(self):
+        if self._eval_task is not None:
+            await self._eval_task
+
+    async def cancel_evals(self):
+        tasks = list(self._eval_tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
     async def execute(self, state: pyspiel.State, retry=False) -> str:
-        move_num = self.pyspiel_state.move_number() // 2 + 1
-        readable_state_str = self.pyspiel_state.to_string()
-
-        moves_so_far = utils.get_pgn(self.pyspiel_state)
-        moves_so_far = str(moves_so_far).strip().split('\n')[-1]
-        
-        to_play = 'White' if self.pyspiel_state.current_player() == 1 else 'Black'
-        
-        legal_moves = {str(i): self.pyspiel_state.action_to_string(i) for i in self.pyspiel_state.legal_actions()}
-        prompt = (
-            f"Let's play chess. The current game state in Forsyth-Edwards Notation (FEN) notation is:\n"
-            f"{readable_state_str}\n"
-            f"The moves played so far are:\n"
-            f"{moves_so_far}.\n"
-            f"The legal moves are:\n"
-            f"{ {k: v for k, v in legal_moves.items()} }\n"
-            f"You are playing as player {to_play}.\n"
-            f"It is now your turn. Play your strongest move. The move MUST be legal.\n"
-            f"Aim to avoid three-fold repetition, perpetual checks, and fifty-move rule draws when you are winning.\n"
-            f"Before giving your final answer, briefly explain your reasoning.\n"
-            f"Then, on the LAST line only, output your final answer in the format:\n"
-            f"Final Answer: Y\n"
-            f"where Y is the index of your chosen move from the legal moves above."
-        )
-        if retry:
-            prompt = (
-                f"The last move was illegal, please make sure to return a valid index in the correct format.\n"
-                f"Let's play chess. The current game state in Forsyth-Edwards Notation (FEN) notation is:\n"
-                f"{readable_state_str}\n"
-                f"The moves played so far are:\n"
-                f"{moves_so_far}.\n"
-                f"The legal moves are:\n"
-                f"{ {k: v for k, v in legal_moves.items()} }\n"
-                f"You are playing as player {to_play}.\n"
-                f"It is now your turn. Play your strongest move. The move MUST be legal.\n"
-                f"Aim to avoid three-fold repetition, perpetual checks, and fifty-move rule draws when you are winning.\n"
-                f"Before giving your final answer, briefly explain your reasoning.\n"
-                f"Then, on the LAST line only, output your final answer in the format:\n"
-                f"Final Answer: Y\n"
-                f"where Y is the index of your chosen move from the legal moves above."
-            )
-        test_mode = os.getenv("TEST_MODE", "false").lower() == "true"
-        if test_mode:
+        if self._eval_task is None:
+            self._schedule_eval(self.record.board.copy(), self._record_initial_eval)
+        if self._move_started is None:
+            self._move_started = time.perf_counter()
+        move_num = self.record.board.fullmove_number
+        to_play = self.to_play()
+
+        with self.timings.span("prompt"):
+            prompt, answers = self.prompt_builder.build(self.pyspiel_state, self.record, to_play, retry)
+        size = prompt_size(prompt)
+        print(f"Prompt for {to_play} move {move_num}: {size['bytes']} bytes, ~{size['tokens_est']} tokens")
+
+        if self.test_mode:
             test_index = int(os.getenv("TEST_INDEX", "0"))
-            with open(f'test_cases/test_case_{test_index}.json', 'r') as f:
-                test_case = json.load(f)
+            test_case = load_test_case(test_index)
             model_response = "In test mode, using predefined move."
-            move = str(self.pyspiel_state.string_to_action(test_case[to_play][move_num - 1]))
-            print(f"Test mode: selected move {move} for {to_play} for {test_case[to_play][move_num - 1]}")
-        else:
-            model_response = await self.send_message_to_agent(to_play, prompt)
-            move = model_response.split("Final Answer: ")[-1].strip()
-        if move in legal_moves:
-            move = legal_moves[move]
+            move_code = self.pyspiel_state.string_to_action(test_case[to_play][move_num - 1])
+            print(f"Test mode: selected move {move_code} for {to_play} for {test_case[to_play][move_num - 1]}")
         else:
-            raise Exception(f"Index not valid: {move}")
-        try:
-            move_code = self.pyspiel_state.string_to_action(move)
-            if move_code not in self.pyspiel_state.legal_actions():
-                raise ValueError(f"Illegal move attempted: {move}")
-            self.pyspiel_state.apply_action(self.pyspiel_state.string_to_action(move))
-        except Exception as e:
-            raise ValueError(f"Failed to apply move '{move}': {e}")
-        
-        move_eval = utils.get_engine_eval(self.pyspiel_state.to_string())
-
-        self.game_data[f'Move {move_num} input prompt for {to_play}'] = prompt
-        self.game_data[f'Move {move_num} model response for {to_play}'] = model_response
-        self.game_data[f"Move {move_num} game evaluation after {to_play}'s move"] = move_eval
-
-        with open(GAME_FILE, "w") as f:
-            f.write(str(utils.get_pgn(self.pyspiel_state)))
-        with open(GAME_DATA_FILE, "w") as f:
-            json.dump(self.game_data, f, indent=4)
+            budget = self.clock.move_budget(to_play)
+            self.clock.start(to_play)
+            try:
+                with self.timings.span("agent"):
+                    # The clock is sent along so a busy white agent can answer the most urgent moves first.
+                    clock = {"move_budget": budget, "clock_remaining": self.clock.time_left(to_play)}
+                    # The HTTP request gets the same budget instead of the client's default timeout,
+                    # and wait_for cancels it (closing the connection) once the clock runs out.
+                    model_response = await asyncio.wait_for(
+                        self.send_message_to_agent(to_play, prompt, metadata=clock, timeout=budget), timeout=budget
+                    )
+            except (asyncio.TimeoutError, A2AClientTimeoutError):
+                self.forfeit(to_play, "time forfeit" if self.clock.flagged(to_play) else "move deadline exceeded")
+                return None
+            finally:
+                self.clock.stop()
+        with self.timings.span("parse"):
+            if not self.test_mode:
+                answer = model_response.split("Final Answer: ")[-1].strip()
+                if answer not in answers:
+                    raise Exception(f"Answer not valid: {answer}")
+                move_code = answers[answer]
+            try:
+                if move_code not in self.pyspiel_state.legal_actions():
+                    raise ValueError(f"Illegal move attempted: {move_code}")
+                move = self.record.apply_action(self.pyspiel_state, move_code)
+            except Exception as e:
+                raise ValueError(f"Failed to apply move '{move_code}': {e}")
+        self.timings.add("move", time.perf_counter() - self._move_started)
+        MOVES.inc()
+        self._move_started = None
+        time_used = self.clock.complete_move(to_play)
+        attempts = self.failed_attempts + 1
+        self.failed_attempts = 0
 
+        timing = {"time_used": time_used, "clock_remaining": self.clock.remaining[to_play], "attempts": attempts}
+        self._schedule_eval(
+            self.record.board.copy(),
+            functools.partial(self._record_move, move_num, to_play, move, prompt, size, model_response, timing),
+        )
+        return move
+
+    def _record_initial_eval(self, initial_eval):
+        self.eval_history.append(initial_eval)
+        self.journal.append({"type": "initial_eval", "eval": initial_eval})
+
+    def _record_move(self, move_num, to_play, san, prompt, size, model_response, timing, move_eval):
+        prev_eval = self.eval_history[-1]
         self.eval_history.append(move_eval)
-        prev_eval = self.eval_history[-2]
-        if to_play == "White":
-            cpl = -1 * (move_eval - prev_eval)
-            self.player_eval["White"]["Overall"].append(cpl)
-            if prev_eval <= 1 and prev_eval >= -1:
-                self.player_eval["White"]["Equal"].append(cpl)
-            elif prev_eval > 1:
-                self.player_eval["White"]["Winning"].append(cpl)
-            elif prev_eval < -1:
-                self.player_eval["White"]["Losing"].append(cpl)
+        scored = move_metrics([prev_eval, move_eval], to_play)
+        cpl = float(scored["cpl"][0])
+        bucket = next(name for name in ("Equal", "Winning", "Losing") if scored["buckets"][name][0])
+        accuracy = float(scored["accuracy"][0])
+        self.running[to_play]["cpl"].update([cpl])
+        self.running[to_play]["accuracy"].update([accuracy])
+        self.journal.append({
+            "type": "move",
+            "move_num": move_num,
+            "player": to_play,
+            "san": san,
+            "prompt": prompt,
+            "prompt_bytes": size["bytes"],
+            "prompt_tokens_est": size["tokens_est"],
+            "response": model_response,
+            "eval": move_eval,
+            "cpl": cpl,
+            "bucket": bucket,
+            **timing,
+        })
+        return {
+            "move_num": move_num,
+            "player": to_play,
+            "san": san,
+            "eval": move_eval,
+            "cpl": cpl,
+            "accuracy": accuracy,
+            **timing,
+            "running": self.running_summary(),
+        }
 
-        else:
-            cpl = move_eval - prev_eval
-            self.player_eval["Black"]["Overall"].append(cpl)
-            if prev_eval <= 1 and prev_eval >= -1:
-                self.player_eval["Black"]["Equal"].append(cpl)
-            elif prev_eval < -1:
-                self.player_eval["Black"]["Winning"].append(cpl)
-            elif prev_eval > 1:
-                self.player_eval["Black"]["Losing"].append(cpl)
-
-        with open(PLAYER_DATA_FILE, "w") as f:
-            json.dump(self.player_eval, f, indent=4)
-        with open(GAME_EVAL_FILE, "w") as f:
-            json.dump(self.eval_history, f, indent=4)
-
-        return move, move_eval
\ No newline at end of file
+    def running_summary(self):
+        return {
+            player: {"moves": stats["cpl"].count, "mean_cpl": stats["cpl"].mean, "mean_accuracy": stats["accuracy"].mean}
+            for player, stats in self.running.items()
+        }
+
+    async def abort(self):
+        """Stop a game that is being cancelled: drop pending evaluations and flush the journal."""
+        self.clock.stop()
+        await self.cancel_evals()
+        self.journal.flush()
+
+    async def finish(self):
+        """Wait for outstanding evaluations, close the journal and write the derived game files."""
+        await self.wait_for_evals()
+        finish_started = time.perf_counter()
+        self.journal.append({
+            "type": "result",
+            "result": self.record.result,
+            "termination": self.record.headers.get("Termination"),
+        })
+        self.journal.flush()
+        self.artifacts = self.journal.artifacts()
+        write_artifacts(self.artifacts, self.output_dir)
+        self.timings.add("finish", time.perf_counter() - finish_started)
+        print(f"A2A request timings: {self.a2a.timing_summary()}")
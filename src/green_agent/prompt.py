@@ -0,0 +1,98 @@
+"""Move prompt rendering for the green agent, with selectable legal-move encodings."""
+
+import ast
+import math
+import os
+import pyspiel
+
+PROMPT_MOVE_ENCODING = os.getenv("PROMPT_MOVE_ENCODING", "dict")
+# dict:  the original {'action id': 'SAN'} mapping, answered with the action id
+# san:   comma-separated SAN moves, answered with the SAN move
+# uci:   comma-separated UCI moves, answered with the UCI move
+# index: space-separated "i:SAN" pairs numbered from 0, answered with i
+ENCODINGS = ("dict", "san", "uci", "index")
+
+ANSWER_DESCRIPTIONS = {
+    "dict": ("index", "where Y is the index of your chosen move from the legal moves above."),
+    "san": ("move", "where Y is your chosen move in SAN, written exactly as in the legal moves above."),
+    "uci": ("move", "where Y is your chosen move in UCI notation, written exactly as in the legal moves above."),
+    "index": ("index", "where Y is the number in front of your chosen move in the legal moves above."),
+}
+
+
+def prompt_size(prompt):
+    """Size of a prompt in bytes and a rough token estimate (about 4 bytes per token)."""
+    size = len(prompt.encode("utf-8"))
+    return {"bytes": size, "tokens_est": math.ceil(size / 4)}
+
+
+def parse_legal_moves(prompt, encoding=PROMPT_MOVE_ENCODING):
+    """Return the answers a prompt accepts, read back from its legal-move line."""
+    legal_text = prompt.split("The legal moves are:\n", 1)[1].split("\n", 1)[0]
+    if encoding == "dict":
+        return list(ast.literal_eval(legal_text))
+    if encoding == "index":
+        return [pair.split(":", 1)[0] for pair in legal_text.split()]
+    return legal_text.split(", ")
+
+
+class PromptBuilder:
+    """Renders the move prompt for a position once and reuses it for retries."""
+
+    def __init__(self, encoding=PROMPT_MOVE_ENCODING):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown move encoding: {encoding}")
+        self.encoding = encoding
+        self._cache_key = None
+        self._cached = None
+
+    def _legal_moves(self, state):
+        """Return the legal-move text and a map from accepted answers to actions."""
+        actions = state.legal_actions()
+        if self.encoding == "uci":
+            board = state.board()
+            names = [pyspiel.chess.action_to_move(a, board).to_lan() for a in actions]
+        else:
+            names = [state.action_to_string(a) for a in actions]
+
+        if self.encoding == "dict":
+            text = f"{ {str(a): name for a, name in zip(actions, names)} }"
+            answers = {str(a): a for a in actions}
+        elif self.encoding == "index":
+            text = " ".join(f"{i}:{name}" for i, name in enumerate(names))
+            answers = {str(i): a for i, a in enumerate(actions)}
+        else:
+            text = ", ".join(names)
+            answers = dict(zip(names, actions))
+        return text, answers
+
+    def build(self, state, record, to_play, retry=False):
+        """Return (prompt, answers) for the position in `state`."""
+        key = (len(record.moves), state.to_string())
+        if key != self._cache_key:
+            legal_text, answers = self._legal_moves(state)
+            answer_kind, answer_description = ANSWER_DESCRIPTIONS[self.encoding]
+            prompt = (
+                f"Let's play chess. The current game state in Forsyth-Edwards Notation (FEN) notation is:\n"
+                f"{state.to_string()}\n"
+                f"The moves played so far are:\n"
+                f"{record.movetext()}.\n"
+                f"The legal moves are:\n"
+                f"{legal_text}\n"
+                f"You are playing as player {to_play}.\n"
+                f"It is now your turn. Play your strongest move. The move MUST be legal.\n"
+                f"Aim to avoid three-fold repetition, perpetual checks, and fifty-move rule draws when you are winning.\n"
+                f"Before giving your final answer, briefly explain your reasoning.\n"
+                f"Then, on the LAST line only, output your final answer in the format:\n"
+                f"Final Answer: Y\n"
+                f"{answer_description}"
+            )
+            retry_prefix = (
+                f"The last move was illegal, please make sure to return a valid {answer_kind} in the correct format.\n"
+            )
+            self._cache_key = key
+            self._cached = (prompt, retry_prefix, answers)
+        prompt, retry_prefix, answers = self._cached
+        if retry:
+            prompt = retry_prefix + prompt
+        return prompt, answers
@@ -0,0 +1,79 @@
+"""Per-assessment game sessions, so one green agent server can run many games at once."""
+
+import os
+import re
+import time
+import uuid
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from src.my_util.utils import GAME_FILE
+
+# Each game writes its journal and game files to GAME_OUTPUT_DIR/<session id>/.
+GAME_OUTPUT_DIR = os.getenv("GAME_OUTPUT_DIR", "games")
+
+
+class GameSession:
+    """One assessment, keyed by its task id: players, game state and artifacts."""
+
+    def __init__(self, session_id=None, white_url=None, black_url=None, output_dir=GAME_OUTPUT_DIR):
+        self.id = session_id or uuid.uuid4().hex
+        self.players = {"White": white_url, "Black": black_url}
+        self.output_dir = os.path.join(output_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", self.id))
+        self.started = time.time()
+        self.status = "running"
+        self.green_agent = None
+
+    @property
+    def artifacts(self):
+        return self.green_agent.artifacts if self.green_agent is not None else None
+
+    def pgn(self):
+        """The finished game's PGN, or the game so far while it is still running."""
+        if self.artifacts:
+            return self.artifacts[GAME_FILE]
+        return self.green_agent.record.pgn() if self.green_agent is not None else None
+
+    def summary(self):
+        summary = {
+            "id": self.id,
+            "status": self.status,
+            "players": self.players,
+            "elapsed_seconds": round(time.time() - self.started, 3),
+            "output_dir": self.output_dir,
+        }
+        if self.green_agent is not None:
+            summary["plies"] = len(self.green_agent.record.board.move_stack)
+            summary["running"] = self.green_agent.running_summary()
+        return summary
+
+
+_sessions = {}
+
+
+def open_session(session_id=None, white_url=None, black_url=None):
+    session = GameSession(session_id, white_url, black_url)
+    if session.id in _sessions:
+        raise ValueError(f"Session {session.id} is already running")
+    _sessions[session.id] = session
+    return session
+
+
+def close_session(session_id):
+    return _sessions.pop(session_id, None)
+
+
+def get_session(session_id):
+    return _sessions.get(session_id)
+
+
+def active_sessions():
+    return list(_sessions.values())
+
+
+async def sessions_endpoint(request):
+    return JSONResponse([session.summary() for session in active_sessions()])
+
+
+def session_routes():
+    """Routes to pass to A2AStarletteApplication.build()."""
+    return [Route("/sessions", sessions_endpoint, methods=["GET"])]
@@ -1,51 +1,27 @@
 """Launcher module - initiates and coordinates the evaluation process."""
 
+import atexit
 import multiprocessing
-import threading
 import time
 import json
 from src.green_agent.agent import start_green_agent
 from src.white_agent.agent import start_white_agent
 from src.my_util import my_a2a
-from src.my_util.utils import close_engine
-
-
-async def launch_evaluation(local: bool = False):
-    # start green agent
-    print("Launching green agent...")
-    green_address = ("localhost", 9001, local)
-    green_url = f"http://{green_address[0]}:{green_address[1]}"
-    p_green = multiprocessing.Process(
-        target=start_green_agent, args=("chess_green_agent", *green_address)
-    )
-    p_green.start()
-    assert await my_a2a.wait_agent_ready(green_url), "Green agent not ready in time"
-    print("Green agent is ready.")
-
-    # start white agent 1
-    print("Launching white agent 1...")
-    white_address_1 = ("localhost", 9002, local)
-    white_url_1 = f"http://{white_address_1[0]}:{white_address_1[1]}"
-    p_white_1 = multiprocessing.Process(
-        target=start_white_agent, args=("general_white_agent", *white_address_1)
-    )
-    p_white_1.start()
-    assert await my_a2a.wait_agent_ready(white_url_1), "White agent 1 not ready in time"
-    print("White agent 1 is ready.")
-
-    # start white agent 2
-    print("Launching white agent 2...")
-    white_address_2 = ("localhost", 9003, local)
-    white_url_2 = f"http://{white_address_2[0]}:{white_address_2[1]}"
-    p_white_2 = multiprocessing.Process(
-        target=start_white_agent, args=("general_white_agent", *white_address_2)
-    )
-    p_white_2.start()
-    assert await my_a2a.wait_agent_ready(white_url_2), "White agent 2 not ready in time"
-    print("White agent 2 is ready.")
-
-    # send the task description
-    print("Sending task description to green agent...")
+from src.my_util.utils import close_engine_pool
+
+
+async def send_task(green_url, task_text, stream=False, cur_timeout=None):
+    """Send the task to the green agent; with `stream`, print each move update as it arrives."""
+    if not stream:
+        return await my_a2a.send_message(green_url, task_text, cur_timeout=cur_timeout)
+    last_event = None
+    async for event in my_a2a.stream_message(green_url, task_text, cur_timeout=cur_timeout):
+        print(my_a2a.describe_event(event))
+        last_event = event
+    return last_event
+
+
+def build_task_text(white_url_1, white_url_2):
     # task_config = {
     #     "env": "chess",
     #     "user_strategy": "llm",
@@ -60,7 +36,7 @@ async def launch_evaluation(local: bool = False):
         # "user_model": "openrouter/openai/gpt-5.1",
         # "user_provider": "litellm_proxy",
     }
-    task_text = f"""
+    return f"""
 Task: instantiate chess benchmark to test the agents located at:
 <white_agent_url>
 {white_url_1}
@@ -73,53 +49,120 @@ You should use the following env configuration:
 {json.dumps(task_config, indent=2)}
 </env_config>
     """
-    print("Task description:")
-    print(task_text)
-    print("Sending...")
-    response = await my_a2a.send_message(green_url, task_text, cur_timeout=None)
-    print("Response from green agent:")
-    print(response)
 
-    print("Evaluation complete. Terminating agents...")
-    p_green.terminate()
-    p_green.join()
-    p_white_1.terminate()
-    p_white_1.join()
-    p_white_2.terminate()
-    p_white_2.join()
-    print("Agents terminated.")
+
+class AgentPool:
+    """Green agent and two white agents running as local processes, reused across evaluations.
+
+    All agents are started at once and probed for readiness concurrently. Agents
+    that have died are restarted before the next evaluation.
+    """
+
+    def __init__(self, local=False, host="localhost", green_port=9001, white_ports=(9002, 9003)):
+        self.local = local
+        self.host = host
+        self.agents = {
+            "green": (start_green_agent, "chess_green_agent", green_port),
+            "white_1": (start_white_agent, "general_white_agent", white_ports[0]),
+            "white_2": (start_white_agent, "general_white_agent", white_ports[1]),
+        }
+        self.processes = {}
+
+    def url(self, name):
+        return f"http://{self.host}:{self.agents[name][2]}"
+
+    async def start(self):
+        """Start every agent that is not running and wait until all of them answer."""
+        started = []
+        for name, (target, agent_name, port) in self.agents.items():
+            process = self.processes.get(name)
+            if process is not None and process.is_alive():
+                continue
+            print(f"Launching {name} agent...")
+            process = multiprocessing.Process(target=target, args=(agent_name, self.host, port, self.local))
+            process.start()
+            self.processes[name] = process
+            started.append(name)
+        if not started:
+            return
+        launched_at = time.perf_counter()
+        ready = await my_a2a.wait_agents_ready([self.url(name) for name in started])
+        not_ready = [url for url, ok in ready.items() if not ok]
+        if not_ready:
+            self.stop()
+            raise RuntimeError(f"Agents not ready in time: {', '.join(not_ready)}")
+        print(f"Agents ready: {', '.join(started)} ({time.perf_counter() - launched_at:.2f}s).")
+
+    async def evaluate(self, stream=False):
+        await self.start()
+        task_text = build_task_text(self.url("white_1"), self.url("white_2"))
+        print("Task description:")
+        print(task_text)
+        print("Sending task description to green agent...")
+        return await send_task(self.url("green"), task_text, stream=stream, cur_timeout=None)
+
+    def stop(self):
+        for process in self.processes.values():
+            process.terminate()
+        for process in self.processes.values():
+            process.join()
+        self.processes = {}
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.stop()
+
+
+_agent_pool = None
+
+
+async def get_agent_pool(local=False):
+    """Started process-wide agent pool, so repeated evaluations skip the cold start."""
+    global _agent_pool
+    if _agent_pool is None or _agent_pool.local != local:
+        close_agent_pool()
+        _agent_pool = AgentPool(local=local)
+    await _agent_pool.start()
+    return _agent_pool
+
+
+def close_agent_pool():
+    global _agent_pool
+    if _agent_pool is not None:
+        _agent_pool.stop()
+        _agent_pool = None
+
+atexit.register(close_agent_pool)
+
+
+async def launch_evaluation(local: bool = False, stream: bool = False, games: int = 1, keep_alive: bool = False):
+    pool = await get_agent_pool(local)
+    try:
+        for game in range(games):
+            print(f"Starting evaluation {game + 1}/{games}...")
+            response = await pool.evaluate(stream=stream)
+            print("Response from green agent:")
+            print(response)
+    finally:
+        if not keep_alive:
+            print("Evaluation complete. Terminating agents...")
+            close_agent_pool()
+            print("Agents terminated.")
 
     try:
-        close_engine()
+        await close_engine_pool()
         print("Engine closed.")
     except Exception as e:
         print(f"Engine close failed: {e}")
 
-async def launch_remote_evaluation(green_url: str, white_url_1: str, white_url_2: str):
-    task_config = {
-        "env": "chess",
-        "user_strategy": "llm",
-        "user_model": "openai/gpt-5.1",
-        "user_provider": "openai",
-        # "user_model": "openrouter/openai/gpt-5.1",
-        # "user_provider": "litellm_proxy",
-    }
-    task_text = f"""
-Task: instantiate chess benchmark to test the agents located at:
-<white_agent_url>
-{white_url_1}
-</white_agent_url>
-<white_agent_url>
-{white_url_2}
-</white_agent_url>
-You should use the following env configuration:
-<env_config>
-{json.dumps(task_config, indent=2)}
-</env_config>
-    """
+async def launch_remote_evaluation(green_url: str, white_url_1: str, white_url_2: str, stream: bool = False):
+    task_text = build_task_text(white_url_1, white_url_2)
 
     print("Sending task description to green agent...")
-    response = await my_a2a.send_message(green_url, task_text)
+    response = await send_task(green_url, task_text, stream=stream, cur_timeout=None if stream else 300.0)
     print("Response from green agent:")
     print(response)
 
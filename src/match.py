@@ -0,0 +1,228 @@
+"""Match module - plays color-swapped game pairs between two agents until a statistical test decides."""
+
+import asyncio
+import math
+import statistics
+import chess
+import numpy as np
+from src.green_agent.agent import ask_agent_to_solve
+
+STOP_RULES = ("sprt", "ci", "none")
+# Score of one agent over a game pair, as a fraction: 0, 1/2, 1, 3/2 or 2 points out of 2.
+PAIR_SCORES = np.array([0.0, 0.25, 0.5, 0.75, 1.0])
+
+
+def expected_score(elo):
+    return 1.0 / (1.0 + 10.0 ** (-elo / 400.0))
+
+
+def score_to_elo(score):
+    score = min(max(score, 1e-3), 1.0 - 1e-3)
+    return 400.0 * math.log10(score / (1.0 - score))
+
+
+def pair_score(pentanomial):
+    """Mean pair score actually achieved, from counts of pairs scoring 0, 1/2, 1, 3/2 and 2 points."""
+    counts = np.asarray(pentanomial, dtype=float)
+    return float(np.dot(counts, PAIR_SCORES) / counts.sum())
+
+
+def pair_stats(pentanomial):
+    """Regularized mean and variance of the pair score, for the GSPRT.
+
+    Half a pair is added to every outcome, for the mean and the variance alike,
+    so the variance stays positive after the first few (often identical) pairs
+    and the mean is pulled slightly towards 1/2 until enough pairs are in.
+    Only the test statistics use these; reports use pair_score.
+    """
+    counts = np.asarray(pentanomial, dtype=float) + 0.5
+    mean = float(np.dot(counts, PAIR_SCORES) / counts.sum())
+    var = float(np.dot(counts, (PAIR_SCORES - mean) ** 2) / counts.sum())
+    return mean, var
+
+
+def sprt_llr(pentanomial, elo0, elo1):
+    """Log-likelihood ratio of elo1 against elo0 (normal approximation, GSPRT) over game pairs.
+
+    Pairs rather than single games are the samples, since both games of a pair
+    start from the same position and their results are correlated.
+    """
+    n = sum(pentanomial)
+    if n == 0:
+        return 0.0
+    mean, var = pair_stats(pentanomial)
+    s0, s1 = expected_score(elo0), expected_score(elo1)
+    return n * (s1 - s0) * (2 * mean - s0 - s1) / (2 * var)
+
+
+def sprt_bounds(alpha, beta):
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+
+def score_interval(pentanomial, confidence):
+    """Confidence interval on the mean pair score, around the raw score with the regularized variance."""
+    n = sum(pentanomial)
+    mean = pair_score(pentanomial)
+    _, var = pair_stats(pentanomial)
+    half_width = statistics.NormalDist().inv_cdf(0.5 + confidence / 2) * math.sqrt(var / n)
+    return mean - half_width, mean + half_width
+
+
+def load_openings(path):
+    """Starting positions from a file with one FEN or EPD per line; blank lines and # comments are skipped."""
+    openings = []
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                board = chess.Board(line)
+            except ValueError:
+                # EPD: no move counters, possibly followed by opcodes.
+                board, _ = chess.Board.from_epd(line)
+            openings.append(board.fen())
+    return openings
+
+
+class Match:
+    """Plays `agent_a` against `agent_b` in pairs of games with colors swapped.
+
+    Each pair starts from the next position in `openings` (or the initial position).
+    After every pair the stop rule is checked: "sprt" stops once the test accepts
+    that agent_a is at least `elo1` stronger (H1) or at most `elo0` (H0); "ci" stops
+    once the confidence interval on agent_a's score excludes 50%; "none" plays all
+    `max_pairs` pairs. Up to `concurrency` pairs are played at once.
+    """
+
+    def __init__(self, agent_a, agent_b, max_pairs=50, openings=None, stop="sprt", elo0=0.0, elo1=50.0,
+                 alpha=0.05, beta=0.05, confidence=0.95, concurrency=1, play_game=ask_agent_to_solve):
+        if stop not in STOP_RULES:
+            raise ValueError(f"Unknown stop rule: {stop}")
+        if agent_a == agent_b:
+            raise ValueError("A match needs two different agents")
+        self.agent_a = agent_a
+        self.agent_b = agent_b
+        self.max_pairs = max_pairs
+        self.openings = list(openings or [])
+        self.stop = stop
+        self.elo0 = elo0
+        self.elo1 = elo1
+        self.bounds = sprt_bounds(alpha, beta)
+        self.confidence = confidence
+        self.concurrency = concurrency
+        self.play_game = play_game
+        self.pentanomial = [0, 0, 0, 0, 0]
+        self.points = {agent_a: 0.0, agent_b: 0.0}
+        self.games_played = 0
+        self.pairs = []
+        self.decision = None
+
+    async def _play(self, white, black, start_fen):
+        try:
+            game_result, _, _ = await self.play_game(white, black, start_fen=start_fen)
+            self.games_played += 1
+            return {"white": white, "black": black, "result": game_result, "error": None}
+        except Exception as e:
+            # Games cancelled after a decision are not counted.
+            self.games_played += 1
+            return {"white": white, "black": black, "result": None, "error": str(e)}
+
+    async def _play_pair(self, index):
+        start_fen = self.openings[index % len(self.openings)] if self.openings else None
+        games = await asyncio.gather(
+            self._play(self.agent_a, self.agent_b, start_fen),
+            self._play(self.agent_b, self.agent_a, start_fen),
+        )
+        pair = {"pair": index + 1, "start_fen": start_fen, "games": list(games), "score_a": None}
+        if all(game["error"] is None for game in games):
+            # Points of agent_a: White in the first game, Black in the second.
+            pair["score_a"] = games[0]["result"][0] + games[1]["result"][1]
+        return pair
+
+    def _record_pair(self, pair):
+        self.pairs.append(pair)
+        if pair["score_a"] is None:
+            return
+        self.pentanomial[round(pair["score_a"] * 2)] += 1
+        self.points[self.agent_a] += pair["score_a"]
+        self.points[self.agent_b] += 2 - pair["score_a"]
+
+    def check_stop(self):
+        """The decision reached so far, or None to keep playing."""
+        if sum(self.pentanomial) == 0 or self.stop == "none":
+            return None
+        if self.stop == "sprt":
+            llr = sprt_llr(self.pentanomial, self.elo0, self.elo1)
+            if llr <= self.bounds[0]:
+                return "H0"
+            if llr >= self.bounds[1]:
+                return "H1"
+            return None
+        low, high = score_interval(self.pentanomial, self.confidence)
+        if low > 0.5:
+            return self.agent_a
+        if high < 0.5:
+            return self.agent_b
+        return None
+
+    async def run(self):
+        """Play pairs until the stop rule decides or `max_pairs` is reached, yielding each finished pair."""
+        pending = set()
+        next_pair = 0
+        try:
+            while True:
+                while next_pair < self.max_pairs and len(pending) < self.concurrency:
+                    pending.add(asyncio.create_task(self._play_pair(next_pair)))
+                    next_pair += 1
+                if not pending:
+                    break
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    pair = task.result()
+                    self._record_pair(pair)
+                    yield pair
+                self.decision = self.check_stop()
+                if self.decision is not None:
+                    break
+        finally:
+            # Pairs still in flight once a decision is reached are abandoned.
+            for task in pending:
+                task.cancel()
+
+    def report(self):
+        pairs = sum(self.pentanomial)
+        report = {
+            "agents": [self.agent_a, self.agent_b],
+            "stop": self.stop,
+            "decision": self.decision,
+            "pairs": pairs,
+            "games": self.games_played,
+            "failed_pairs": len(self.pairs) - pairs,
+            "points": self.points,
+            "pentanomial": list(self.pentanomial),
+            "max_games": 2 * self.max_pairs,
+            "games_saved": 2 * self.max_pairs - self.games_played,
+            "games_saved_percent": round(100.0 * (1 - self.games_played / (2 * self.max_pairs)), 1),
+        }
+        if pairs:
+            mean = pair_score(self.pentanomial)
+            low, high = score_interval(self.pentanomial, self.confidence)
+            report["score"] = round(mean, 4)
+            report["elo"] = round(score_to_elo(mean), 1)
+            report["elo_interval"] = [round(score_to_elo(low), 1), round(score_to_elo(high), 1)]
+        if self.stop == "sprt":
+            report["llr"] = round(sprt_llr(self.pentanomial, self.elo0, self.elo1), 3)
+            report["llr_bounds"] = [round(bound, 3) for bound in self.bounds]
+            report["elo0"], report["elo1"] = self.elo0, self.elo1
+        return report
+
+
+async def run_match(agent_a, agent_b, max_pairs=50, openings=None, stop="sprt", elo0=0.0, elo1=50.0,
+                    alpha=0.05, beta=0.05, confidence=0.95, concurrency=1):
+    match = Match(agent_a, agent_b, max_pairs, openings, stop, elo0, elo1, alpha, beta, confidence, concurrency)
+    async for pair in match.run():
+        print(f"Pair finished: {pair}")
+    report = match.report()
+    print(f"Match report: {report}")
+    return match
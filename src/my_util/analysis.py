@@ -0,0 +1,155 @@
+"""Per-game engine analysis that keeps the engine's search state warm between plies."""
+
+import asyncio
+import io
+import os
+import time
+import chess
+import chess.engine
+import chess.pgn
+import numpy as np
+from src.my_util import utils
+from src.my_util.eval_cache import get_eval_cache
+from src.my_util.opening_index import get_opening_index
+from src.my_util.stats import win_percent
+
+# Comma-separated UCI limits, e.g. "depth=15", "nodes=300000" or "time=0.2".
+ANALYSIS_LIMIT = os.getenv("ANALYSIS_LIMIT", "depth=15")
+LIMIT_KEYS = {"depth": int, "nodes": int, "time": float}
+
+
+def parse_limit(text):
+    """Turn "depth=15,nodes=100000" into a chess.engine.Limit."""
+    kwargs = {}
+    for part in text.split(","):
+        key, _, value = part.strip().partition("=")
+        if key not in LIMIT_KEYS:
+            raise ValueError(f"Unknown analysis limit: {key}")
+        kwargs[key] = LIMIT_KEYS[key](value)
+    return chess.engine.Limit(**kwargs)
+
+
+def cache_depth(limit):
+    """Depth to cache results under, or None when the limit is not a pure fixed depth."""
+    if limit.depth is not None and limit.nodes is None and limit.time is None:
+        return limit.depth
+    return None
+
+
+class AnalysisSession:
+    """Analyses the positions of one game in order on the same engine.
+
+    The engine is given the game's move list rather than a bare FEN and is not sent
+    `ucinewgame` between plies, so its transposition table carries over from one
+    position to the next. The session asks the pool for the engine it used last; if
+    another game got it in the meantime, the engine starts a new game (cold hash).
+    """
+
+    def __init__(self, pool=None, limit=None, use_stored=True, timings=None):
+        self.pool = pool or utils.get_engine_pool()
+        self.limit = limit or parse_limit(ANALYSIS_LIMIT)
+        self.depth = cache_depth(self.limit)
+        # Whether to consult (and fill) the opening index and eval cache.
+        self.use_stored = use_stored
+        # python-chess sends ucinewgame whenever the `game` key changes.
+        self.key = object()
+        self._engine = None
+        self._lock = asyncio.Lock()
+        # PhaseTimings to record "eval_wait" (session lock and pool checkout) and "eval" (the search) in.
+        self.timings = timings
+
+    async def analyse(self, board):
+        """Evaluate `board` (with its move stack) in pawns from White's point of view."""
+        fen = board.fen()
+        if self.use_stored:
+            # The opening index is searched deeper than any per-move limit, so it is
+            # used for node and time limits too.
+            index = get_opening_index()
+            indexed = index.get(fen, self.depth or 0) if index is not None else None
+            if indexed is not None:
+                return indexed
+        cache = get_eval_cache() if self.use_stored and self.depth is not None else None
+        # SQLite reads and writes (and their fsyncs) run in a thread, off the games' event loop.
+        if cache is not None:
+            cached = await asyncio.to_thread(cache.get, fen, self.depth)
+            if cached is not None:
+                return cached
+        waiting = time.perf_counter()
+        async with self._lock:
+            async with self.pool.engine(prefer=self._engine) as engine:
+                searching = time.perf_counter()
+                info = await engine.analyse(board, self.limit, game=self.key)
+                self._engine = engine
+                if self.timings is not None:
+                    self.timings.add("eval_wait", searching - waiting)
+                    self.timings.add("eval", time.perf_counter() - searching)
+        eval_pawns = utils.score_to_pawns(info["score"])
+        if cache is not None:
+            await asyncio.to_thread(cache.put, fen, self.depth, eval_pawns)
+        return eval_pawns
+
+
+async def _cold_evals(pool, boards, limit):
+    # A fresh game key per position clears the hash, like the old FEN-only analysis.
+    evals = []
+    for board in boards:
+        info = await pool.analyse(chess.Board(board.fen()), limit, game=object())
+        evals.append(utils.score_to_pawns(info["score"]))
+    return evals
+
+
+async def _session_evals(pool, boards, limit):
+    # Bypass the opening index and eval cache so the comparison measures the engine.
+    session = AnalysisSession(pool, limit, use_stored=False)
+    return [await session.analyse(board) for board in boards]
+
+
+def _error_summary(evals, reference):
+    diff = np.abs(np.asarray(evals) - np.asarray(reference))
+    win_diff = np.abs(win_percent(evals) - win_percent(reference))
+    return {
+        "mean_abs_pawns": round(float(diff.mean()), 3),
+        "max_abs_pawns": round(float(diff.max()), 3),
+        "mean_abs_win_percent": round(float(win_diff.mean()), 3),
+    }
+
+
+async def compare_with_fixed_depth(pgn_text, limit=None, depth=15, reference_depth=None):
+    """Compare session analysis against cold fixed-depth analysis on the games in `pgn_text`.
+
+    Reports seconds per ply for both, and the eval difference between them. With
+    `reference_depth`, both are also scored against a deeper cold search.
+    """
+    limit = limit or parse_limit(ANALYSIS_LIMIT)
+    pool = utils.EnginePool(size=1)
+    report = {"limit": str(limit), "depth": depth, "games": []}
+    try:
+        handle = io.StringIO(pgn_text)
+        while (game := chess.pgn.read_game(handle)) is not None:
+            board = game.board()
+            boards = [board.copy()]
+            for move in game.mainline_moves():
+                board.push(move)
+                boards.append(board.copy())
+
+            start = time.perf_counter()
+            cold = await _cold_evals(pool, boards, chess.engine.Limit(depth=depth))
+            cold_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            warm = await _session_evals(pool, boards, limit)
+            warm_seconds = time.perf_counter() - start
+
+            result = {
+                "plies": len(boards),
+                "cold_seconds_per_ply": round(cold_seconds / len(boards), 4),
+                "session_seconds_per_ply": round(warm_seconds / len(boards), 4),
+                "session_vs_cold": _error_summary(warm, cold),
+            }
+            if reference_depth:
+                reference = await _cold_evals(pool, boards, chess.engine.Limit(depth=reference_depth))
+                result["cold_vs_reference"] = _error_summary(cold, reference)
+                result["session_vs_reference"] = _error_summary(warm, reference)
+            report["games"].append(result)
+    finally:
+        await pool.close()
+    return report
@@ -0,0 +1,174 @@
+"""Storage backends for game artifacts and shared state (GCS bucket or local directory)."""
+
+import abc
+import asyncio
+import fcntl
+import os
+import threading
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "gcs")
+LOCAL_STORAGE_DIR = os.getenv("LOCAL_STORAGE_DIR", "local_storage")
+
+JSON_CONTENT_TYPE = "application/json"
+PGN_CONTENT_TYPE = "application/x-chess-pgn"
+# Attempts to read an object that keeps changing between its metadata read and its download.
+DOWNLOAD_ATTEMPTS = 10
+
+
+class StorageBackend(abc.ABC):
+    """Interface for object storage. Names are flat object names, as in a bucket."""
+
+    @abc.abstractmethod
+    def upload(self, name, data, content_type=JSON_CONTENT_TYPE):
+        pass
+
+    @abc.abstractmethod
+    def download(self, name):
+        """Return the object's bytes, or None if it does not exist."""
+
+    @abc.abstractmethod
+    def list(self, prefix=""):
+        pass
+
+    @abc.abstractmethod
+    def download_with_generation(self, name):
+        """Return (data, generation); generation is 0 when the object does not exist."""
+
+    @abc.abstractmethod
+    def upload_if_generation(self, name, data, generation, content_type=JSON_CONTENT_TYPE):
+        """Write only if the object is still at `generation`. Returns False if it changed."""
+
+    async def upload_many(self, objects):
+        """Upload {name: (data, content_type)} concurrently."""
+        await asyncio.gather(*(
+            asyncio.to_thread(self.upload, name, data, content_type)
+            for name, (data, content_type) in objects.items()
+        ))
+
+
+class GCSBackend(StorageBackend):
+    def __init__(self, bucket_name=None):
+        from google.cloud import storage
+
+        self.bucket_name = bucket_name or os.environ["AGENT_BUCKET"]
+        # One client (and its HTTP connection pool) shared by every upload and download.
+        self.client = storage.Client()
+        self.bucket = self.client.bucket(self.bucket_name)
+
+    def upload(self, name, data, content_type=JSON_CONTENT_TYPE):
+        self.bucket.blob(name).upload_from_string(data, content_type=content_type)
+
+    def download(self, name):
+        from google.api_core.exceptions import NotFound
+
+        try:
+            return self.bucket.blob(name).download_as_bytes()
+        except NotFound:
+            return None
+
+    def list(self, prefix=""):
+        return [blob.name for blob in self.client.list_blobs(self.bucket_name, prefix=prefix)]
+
+    def download_with_generation(self, name):
+        from google.api_core.exceptions import NotFound, PreconditionFailed
+
+        for _ in range(DOWNLOAD_ATTEMPTS):
+            blob = self.bucket.get_blob(name)
+            if blob is None:
+                return None, 0
+            try:
+                return blob.download_as_bytes(if_generation_match=blob.generation), blob.generation
+            except (NotFound, PreconditionFailed):
+                # Replaced or deleted between the metadata read and the download; read again.
+                continue
+        raise RuntimeError(f"{name} kept changing while being read ({DOWNLOAD_ATTEMPTS} attempts)")
+
+    def upload_if_generation(self, name, data, generation, content_type=JSON_CONTENT_TYPE):
+        from google.api_core.exceptions import PreconditionFailed
+
+        try:
+            self.bucket.blob(name).upload_from_string(
+                data, content_type=content_type, if_generation_match=generation
+            )
+        except PreconditionFailed:
+            return False
+        return True
+
+
+class LocalBackend(StorageBackend):
+    def __init__(self, root=LOCAL_STORAGE_DIR):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.root, name)
+
+    def upload(self, name, data, content_type=JSON_CONTENT_TYPE):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        path = self._path(name)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def download(self, name):
+        try:
+            with open(self._path(name), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def list(self, prefix=""):
+        return sorted(
+            name for name in os.listdir(self.root)
+            if name.startswith(prefix) and not name.endswith((".tmp", ".lock"))
+        )
+
+    def _read_generation(self, lock):
+        # The object's generation is a counter stored in its lock file.
+        lock.seek(0)
+        content = lock.read().strip()
+        return int(content) if content else 0
+
+    def download_with_generation(self, name):
+        path = self._path(name)
+        with open(f"{path}.lock", "a+") as lock:
+            fcntl.flock(lock, fcntl.LOCK_SH)
+            return self.download(name), self._read_generation(lock)
+
+    def upload_if_generation(self, name, data, generation, content_type=JSON_CONTENT_TYPE):
+        path = self._path(name)
+        # Holding the lock file makes the compare-and-write atomic across processes on this host.
+        with open(f"{path}.lock", "a+") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            current = self._read_generation(lock)
+            if current != generation:
+                return False
+            self.upload(name, data, content_type)
+            lock.truncate(0)
+            lock.write(str(current + 1))
+            return True
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_storage_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if STORAGE_BACKEND == "gcs":
+                _backend = GCSBackend()
+            elif STORAGE_BACKEND == "local":
+                _backend = LocalBackend()
+            else:
+                raise ValueError(f"Unknown storage backend: {STORAGE_BACKEND}")
+        return _backend
+
+
+def set_storage_backend(backend):
+    global _backend
+    with _backend_lock:
+        _backend = backend
@@ -0,0 +1,154 @@
+"""Persistent, size-bounded cache of engine evaluations keyed by position and depth."""
+
+import os
+import sqlite3
+import threading
+import time
+import chess
+
+EVAL_CACHE_PATH = os.getenv("EVAL_CACHE_PATH", "eval_cache.sqlite3")
+EVAL_CACHE_MAX_ENTRIES = int(os.getenv("EVAL_CACHE_MAX_ENTRIES", "200000"))
+# A hit only rewrites an entry's last_used time once it is older than this many seconds.
+EVAL_CACHE_TOUCH_SECONDS = int(os.getenv("EVAL_CACHE_TOUCH_SECONDS", "3600"))
+
+
+def normalize_fen(fen):
+    # Drop the move counters and keep the en passant square only when a capture is legal,
+    # so transpositions reached by different move orders share a cache entry.
+    return chess.Board(fen).epd()
+
+
+class EvalCache:
+    """SQLite-backed evaluation cache with approximately least-recently-used eviction.
+
+    The file may be shared by several processes (agents, tournaments, reanalysis
+    workers), so the entry count is kept in the database by triggers. last_used is
+    a Unix time, refreshed by a hit only every `touch_seconds`, so lookups are
+    almost always read-only: under WAL they run alongside each other and alongside
+    a writer. Each thread has its own connection.
+    Every lookup and store is counted so the hit rate can be reported.
+    """
+
+    def __init__(self, path=EVAL_CACHE_PATH, max_entries=EVAL_CACHE_MAX_ENTRIES,
+                 touch_seconds=EVAL_CACHE_TOUCH_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.touch_seconds = touch_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._conns = []
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS evals ("
+            "position TEXT NOT NULL, depth INTEGER NOT NULL, eval REAL NOT NULL, "
+            "last_used INTEGER NOT NULL, PRIMARY KEY (position, depth))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS evals_last_used ON evals (last_used)")
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS evals_meta (id INTEGER PRIMARY KEY CHECK (id = 0), entries INTEGER NOT NULL)"
+        )
+        conn.execute("INSERT OR IGNORE INTO evals_meta VALUES (0, (SELECT COUNT(*) FROM evals))")
+        conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS evals_count_insert AFTER INSERT ON evals "
+            "BEGIN UPDATE evals_meta SET entries = entries + 1; END"
+        )
+        conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS evals_count_delete AFTER DELETE ON evals "
+            "BEGIN UPDATE evals_meta SET entries = entries - 1; END"
+        )
+        conn.execute("COMMIT")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._conns.append(conn)
+        return conn
+
+    def _entries(self):
+        return self._connection().execute("SELECT entries FROM evals_meta").fetchone()[0]
+
+    def get(self, fen, depth):
+        key = normalize_fen(fen)
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT eval, last_used FROM evals WHERE position = ? AND depth = ?", (key, depth)
+        ).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if row is None:
+            return None
+        now = int(time.time())
+        if now - row[1] >= self.touch_seconds:
+            conn.execute(
+                "UPDATE evals SET last_used = ? WHERE position = ? AND depth = ?", (now, key, depth)
+            )
+        return row[0]
+
+    def put(self, fen, depth, value):
+        key = normalize_fen(fen)
+        conn = self._connection()
+        # One write transaction, so the count checked is the one this insert produced.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO evals (position, depth, eval, last_used) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (position, depth) DO UPDATE SET eval = excluded.eval, last_used = excluded.last_used",
+                (key, depth, value, int(time.time())),
+            )
+            entries = self._entries()
+            if entries > self.max_entries:
+                self._evict(conn, entries)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _evict(self, conn, entries):
+        # Trim 10% below the bound so eviction runs once per batch of inserts, not per insert.
+        # Entries last used at the same time go in insertion order.
+        target = int(self.max_entries * 0.9)
+        conn.execute(
+            "DELETE FROM evals WHERE rowid IN (SELECT rowid FROM evals ORDER BY last_used, rowid LIMIT ?)",
+            (entries - target,),
+        )
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate(),
+            "entries": self._entries(),
+            "max_entries": self.max_entries,
+        }
+
+    def close(self):
+        with self._lock:
+            conns, self._conns = self._conns, []
+        for conn in conns:
+            conn.close()
+        self._local = threading.local()
+
+
+_eval_cache = None
+
+
+def get_eval_cache():
+    global _eval_cache
+    if _eval_cache is None:
+        _eval_cache = EvalCache()
+    return _eval_cache
@@ -0,0 +1,84 @@
+"""Incremental game record kept in step with a pyspiel chess state."""
+
+import chess
+import pyspiel
+
+
+def result_from_returns(returns):
+    # Note: Results are 'white-black', while returns are 'black, white'.
+    score = {
+        -1: "0",
+        0: "1/2",
+        1: "1",
+    }
+    return "-".join(reversed([score[x] for x in returns]))
+
+
+class GameRecord:
+    """Move history of one game, appended to as each action is applied.
+
+    The move-text line and the PGN are maintained as moves are played, so reading
+    them costs the same on move 150 as on move 1.
+    """
+
+    def __init__(self, player_names=None, fen=None):
+        if player_names is None:
+            player_names = ["Black", "White"]
+        # Same seven tag roster as chess.pgn.Game, so the output matches utils.get_pgn.
+        self.headers = {
+            "Event": "Chess Game",
+            "Site": "?",
+            "Date": "????.??.??",
+            "Round": "?",
+            "White": player_names[1],
+            "Black": player_names[0],
+            "Result": "*",
+        }
+        self.board = chess.Board(fen) if fen else chess.Board()
+        if fen:
+            self.headers["SetUp"] = "1"
+            self.headers["FEN"] = fen
+        self.moves = []
+        self.sans = []
+        self._movetext = ""
+
+    def apply_action(self, state, action):
+        """Apply `action` to `state` and record it."""
+        move = chess.Move.from_uci(pyspiel.chess.action_to_move(action, state.board()).to_lan())
+        san = self.board.san(move)
+        if self.board.turn == chess.WHITE:
+            token = f"{self.board.fullmove_number}. {san}"
+        elif not self.moves:
+            token = f"{self.board.fullmove_number}... {san}"
+        else:
+            token = san
+        state.apply_action(action)
+        self.board.push(move)
+        self.moves.append(move.uci())
+        self.sans.append(san)
+        self._movetext = f"{self._movetext} {token}" if self._movetext else token
+        if state.is_terminal():
+            self.headers["Result"] = result_from_returns(state.returns())
+        return san
+
+    def set_result(self, result, termination=None):
+        """Set the result of a game decided off the board (e.g. a forfeit)."""
+        self.headers["Result"] = result
+        if termination is not None:
+            self.headers["Termination"] = termination
+
+    @property
+    def result(self):
+        return self.headers["Result"]
+
+    def movetext(self):
+        """The whole move-text section on a single line, ending with the result."""
+        return f"{self._movetext} {self.result}" if self._movetext else self.result
+
+    def pgn(self):
+        # Like str(chess.pgn.Game), the move text is written on a single line.
+        header_text = "\n".join(f'[{k} "{v}"]' for k, v in self.headers.items())
+        return f"{header_text}\n\n{self.movetext()}"
+
+    def __str__(self):
+        return self.pgn()
@@ -0,0 +1,110 @@
+"""Append-only per-move journal of a game, from which the game artifacts are derived."""
+
+import json
+import os
+from src.my_util.timing import get_timings
+from src.my_util.utils import (
+    GAME_FILE,
+    GAME_DATA_FILE,
+    PLAYER_DATA_FILE,
+    GAME_EVAL_FILE,
+    GAME_JOURNAL_FILE,
+)
+from src.my_util.stats import new_player_eval
+
+JOURNAL_FLUSH_EVERY = int(os.getenv("JOURNAL_FLUSH_EVERY", "10"))
+
+
+class GameJournal:
+    """JSONL journal with one record per event, buffered and appended in batches.
+
+    Records are dicts with a "type" of "header", "initial_eval", "move" or "result".
+    """
+
+    def __init__(self, path=GAME_JOURNAL_FILE, flush_every=JOURNAL_FLUSH_EVERY):
+        self.path = path
+        self.flush_every = flush_every
+        self.records = []
+        self._pending = []
+        with open(self.path, "w"):
+            pass
+
+    def append(self, record):
+        self.records.append(record)
+        self._pending.append(json.dumps(record))
+        if len(self._pending) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        with get_timings().span("flush"):
+            with open(self.path, "a") as f:
+                f.write("\n".join(self._pending) + "\n")
+        self._pending = []
+
+    def artifacts(self):
+        return derive_artifacts(self.records)
+
+    def write_artifacts(self, directory="."):
+        self.flush()
+        write_artifacts(self.artifacts(), directory)
+
+
+def read_journal(path=GAME_JOURNAL_FILE):
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def derive_artifacts(records):
+    """Rebuild the contents of game.pgn, game_data.json, player_data.json and game_eval.json."""
+    headers = {}
+    result = "*"
+    tokens = []
+    game_data = {}
+    player_eval = new_player_eval()
+    eval_history = []
+    for record in records:
+        kind = record["type"]
+        if kind == "header":
+            headers = dict(record["headers"])
+        elif kind == "initial_eval":
+            eval_history.append(record["eval"])
+        elif kind == "move":
+            move_num, player = record["move_num"], record["player"]
+            if player == "White":
+                tokens.append(f"{move_num}. {record['san']}")
+            elif not tokens:
+                tokens.append(f"{move_num}... {record['san']}")
+            else:
+                tokens.append(record["san"])
+            game_data[f"Move {move_num} input prompt for {player}"] = record["prompt"]
+            game_data[f"Move {move_num} model response for {player}"] = record["response"]
+            game_data[f"Move {move_num} game evaluation after {player}'s move"] = record["eval"]
+            if "time_used" in record:
+                game_data[f"Move {move_num} time used by {player}"] = record["time_used"]
+            eval_history.append(record["eval"])
+            player_eval[player]["Overall"].append(record["cpl"])
+            player_eval[player][record["bucket"]].append(record["cpl"])
+        elif kind == "result":
+            result = record["result"]
+            if record.get("termination"):
+                headers["Termination"] = record["termination"]
+    headers["Result"] = result
+    header_text = "\n".join(f'[{k} "{v}"]' for k, v in headers.items())
+    pgn_text = f"{header_text}\n\n{' '.join(tokens + [result])}"
+    return {
+        GAME_FILE: pgn_text,
+        GAME_DATA_FILE: game_data,
+        PLAYER_DATA_FILE: player_eval,
+        GAME_EVAL_FILE: eval_history,
+    }
+
+
+def write_artifacts(artifacts, directory="."):
+    for name, content in artifacts.items():
+        with open(os.path.join(directory, name), "w") as f:
+            if isinstance(content, str):
+                f.write(content)
+            else:
+                json.dump(content, f, indent=4)
@@ -1,5 +1,8 @@
 import httpx
 import asyncio
+import json
+import os
+import time
 import uuid
 
 
@@ -13,44 +16,66 @@ from a2a.types import (
     Role,
     SendMessageRequest,
     SendMessageResponse,
+    SendStreamingMessageRequest,
+    TaskStatusUpdateEvent,
+    TaskArtifactUpdateEvent,
 )
+from a2a.utils import get_text_parts
+
+
+AGENT_CARD_TTL = float(os.getenv("AGENT_CARD_TTL", "300"))
+AGENT_READY_TIMEOUT = float(os.getenv("AGENT_READY_TIMEOUT", "30"))
+AGENT_READY_INTERVAL = 0.05
+# Agents that list this extension in their card accept the green agent's end-of-game notice.
+GAME_OVER_EXTENSION = "urn:green-agent:game-over"
+
+
+def supports_extension(card: AgentCard | None, uri: str) -> bool:
+    extensions = (card.capabilities.extensions if card is not None and card.capabilities else None) or []
+    return any(extension.uri == uri for extension in extensions)
 
 
 async def get_agent_card(url: str) -> AgentCard | None:
-    httpx_client = httpx.AsyncClient()
-    resolver = A2ACardResolver(httpx_client=httpx_client, base_url=url)
+    async with httpx.AsyncClient() as httpx_client:
+        resolver = A2ACardResolver(httpx_client=httpx_client, base_url=url)
 
-    card: AgentCard | None = await resolver.get_agent_card()
+        card: AgentCard | None = await resolver.get_agent_card()
 
     return card
 
 
-async def wait_agent_ready(url, timeout=10):
+async def wait_agent_ready(url, timeout=AGENT_READY_TIMEOUT, interval=AGENT_READY_INTERVAL, httpx_client=None):
     # wait until the A2A server is ready, check by getting the agent card
-    retry_cnt = 0
-    while retry_cnt < timeout:
-        retry_cnt += 1
-        try:
-            card = await get_agent_card(url)
-            if card is not None:
-                return True
-            else:
-                print(
-                    f"Agent card not available yet..., retrying {retry_cnt}/{timeout}"
-                )
-        except Exception:
-            pass
-        await asyncio.sleep(1)
-    return False
+    own_client = httpx_client is None
+    if own_client:
+        httpx_client = httpx.AsyncClient(timeout=2.0)
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            try:
+                resolver = A2ACardResolver(httpx_client=httpx_client, base_url=url)
+                if await resolver.get_agent_card() is not None:
+                    return True
+            except Exception:
+                pass
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(interval)
+    finally:
+        if own_client:
+            await httpx_client.aclose()
 
 
-async def send_message(
-    url, message, task_id=None, context_id=None, cur_timeout=300.0
-) -> SendMessageResponse:
-    card = await get_agent_card(url)
-    httpx_client = httpx.AsyncClient(timeout=cur_timeout)
-    client = A2AClient(httpx_client=httpx_client, agent_card=card)
+async def wait_agents_ready(urls, timeout=AGENT_READY_TIMEOUT, interval=AGENT_READY_INTERVAL):
+    """Probe several agents concurrently over one HTTP client; returns {url: ready}."""
+    async with httpx.AsyncClient(timeout=2.0) as httpx_client:
+        ready = await asyncio.gather(
+            *(wait_agent_ready(url, timeout, interval, httpx_client) for url in urls)
+        )
+    return dict(zip(urls, ready))
+
 
+def build_message_request(message, task_id=None, context_id=None, metadata=None) -> SendMessageRequest:
     message_id = uuid.uuid4().hex
     params = MessageSendParams(
         message=Message(
@@ -59,9 +84,134 @@ async def send_message(
             message_id=message_id,
             task_id=task_id,
             context_id=context_id,
+            metadata=metadata,
         )
     )
     request_id = uuid.uuid4().hex
-    req = SendMessageRequest(id=request_id, params=params)
-    response = await client.send_message(request=req)
-    return response
+    return SendMessageRequest(id=request_id, params=params)
+
+
+async def send_message(
+    url, message, task_id=None, context_id=None, cur_timeout=300.0
+) -> SendMessageResponse:
+    async with A2AClientManager(timeout=cur_timeout) as manager:
+        return await manager.send_message(url, message, task_id=task_id, context_id=context_id)
+
+
+def _result(response):
+    if not hasattr(response.root, "result"):
+        raise RuntimeError(f"A2A request failed: {response.root.error}")
+    return response.root.result
+
+
+async def stream_message(url, message, task_id=None, context_id=None, cur_timeout=None):
+    """Yield the events of a streaming request; falls back to one response if the agent cannot stream."""
+    async with A2AClientManager(timeout=cur_timeout) as manager:
+        async for event in manager.send_message_streaming(url, message, task_id=task_id, context_id=context_id):
+            yield event
+
+
+def describe_event(event):
+    """One-line text for a streamed event (status message text or move, artifact name or the event kind)."""
+    if isinstance(event, TaskStatusUpdateEvent):
+        message = event.status.message
+        if message:
+            text = " ".join(get_text_parts(message.parts))
+        else:
+            move = (event.metadata or {}).get("move")
+            text = json.dumps(move) if move is not None else ""
+        return f"[{event.status.state.value}] {text}".strip()
+    if isinstance(event, TaskArtifactUpdateEvent):
+        return f"[artifact] {event.artifact.name}"
+    if isinstance(event, Message):
+        return " ".join(get_text_parts(event.parts))
+    return f"[{event.kind}]"
+
+
+class A2AClientManager:
+    """Reusable A2A clients: one keep-alive connection pool and one cached agent card per URL.
+
+    Use one manager for the lifetime of a game and close it (or use it as an async
+    context manager) when the game ends. Every request's timing is kept in `timings`.
+    """
+
+    def __init__(self, card_ttl=AGENT_CARD_TTL, timeout=300.0, max_connections=4):
+        self.card_ttl = card_ttl
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections, max_keepalive_connections=max_connections
+        )
+        self.timings = []
+        self._http_clients = {}
+        self._clients = {}
+
+    def _http_client(self, url) -> httpx.AsyncClient:
+        if url not in self._http_clients:
+            self._http_clients[url] = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+        return self._http_clients[url]
+
+    async def _client(self, url) -> tuple[A2AClient, AgentCard]:
+        cached = self._clients.get(url)
+        if cached is not None and time.monotonic() - cached[2] < self.card_ttl:
+            return cached[0], cached[1]
+        httpx_client = self._http_client(url)
+        resolver = A2ACardResolver(httpx_client=httpx_client, base_url=url)
+        card = await resolver.get_agent_card()
+        client = A2AClient(httpx_client=httpx_client, agent_card=card)
+        self._clients[url] = (client, card, time.monotonic())
+        return client, card
+
+    async def get_agent_card(self, url) -> AgentCard:
+        _, card = await self._client(url)
+        return card
+
+    async def send_message(
+        self, url, message, task_id=None, context_id=None, cur_timeout=None, metadata=None
+    ) -> SendMessageResponse:
+        started = time.perf_counter()
+        client, _ = await self._client(url)
+        sent = time.perf_counter()
+        req = build_message_request(message, task_id=task_id, context_id=context_id, metadata=metadata)
+        http_kwargs = {"timeout": cur_timeout} if cur_timeout is not None else None
+        response = await client.send_message(request=req, http_kwargs=http_kwargs)
+        finished = time.perf_counter()
+        self.timings.append({
+            "url": url,
+            "card_seconds": sent - started,
+            "request_seconds": finished - sent,
+            "total_seconds": finished - started,
+        })
+        return response
+
+    async def send_message_streaming(self, url, message, task_id=None, context_id=None):
+        """Yield task, status, artifact and message events as the agent produces them."""
+        client, card = await self._client(url)
+        if not (card.capabilities and card.capabilities.streaming):
+            response = await self.send_message(url, message, task_id=task_id, context_id=context_id)
+            yield _result(response)
+            return
+        req = build_message_request(message, task_id=task_id, context_id=context_id)
+        streaming_req = SendStreamingMessageRequest(id=req.id, params=req.params)
+        async for response in client.send_message_streaming(streaming_req):
+            yield _result(response)
+
+    def timing_summary(self):
+        summary = {}
+        for timing in self.timings:
+            entry = summary.setdefault(timing["url"], {"requests": 0, "total_seconds": 0.0})
+            entry["requests"] += 1
+            entry["total_seconds"] += timing["total_seconds"]
+        for entry in summary.values():
+            entry["mean_seconds"] = entry["total_seconds"] / entry["requests"]
+        return summary
+
+    async def aclose(self):
+        clients, self._http_clients = self._http_clients, {}
+        self._clients = {}
+        await asyncio.gather(*(client.aclose() for client in clients.values()))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
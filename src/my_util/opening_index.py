@@ -0,0 +1,87 @@
+"""Read-only, memory-mapped index of precomputed opening evaluations.
+
+The file is a 16-byte header (magic, version, record count) followed by fixed
+12-byte records sorted by key: polyglot Zobrist hash (uint64), search depth
+(uint16) and evaluation in centipawns from White's point of view (int16). Lookups
+binary-search the mapped file directly, so every process that opens the index
+shares the same page-cache pages instead of holding its own copy.
+"""
+
+import mmap
+import os
+import struct
+import chess
+import chess.polyglot
+import numpy as np
+
+OPENING_INDEX_PATH = os.getenv("OPENING_INDEX_PATH", "opening_index.bin")
+MAGIC = b"OPIX"
+VERSION = 1
+HEADER = struct.Struct("<4sIQ")
+RECORD_DTYPE = np.dtype([("key", "<u8"), ("depth", "<u2"), ("eval", "<i2")])
+
+
+def position_key(position):
+    """Polyglot Zobrist hash of a chess.Board or FEN string."""
+    board = chess.Board(position) if isinstance(position, str) else position
+    return chess.polyglot.zobrist_hash(board)
+
+
+def write_opening_index(entries, path=OPENING_INDEX_PATH):
+    """Write {key: (depth, eval_pawns)} as a sorted index file, replacing `path` atomically."""
+    records = np.zeros(len(entries), dtype=RECORD_DTYPE)
+    for i, (key, (depth, eval_pawns)) in enumerate(sorted(entries.items())):
+        records[i] = (key, depth, int(np.clip(round(eval_pawns * 100), -32768, 32767)))
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(records)))
+        f.write(records.tobytes())
+    os.replace(tmp_path, path)
+    return len(records)
+
+
+class OpeningIndex:
+    def __init__(self, path=OPENING_INDEX_PATH):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not an opening index (version {VERSION})")
+        self.records = np.frombuffer(self._mmap, dtype=RECORD_DTYPE, count=count, offset=HEADER.size)
+        self._keys = self.records["key"]
+
+    def __len__(self):
+        return len(self.records)
+
+    def get(self, position, depth=0):
+        """Eval in pawns for the position if it was indexed at `depth` or deeper, else None."""
+        key = position_key(position)
+        i = int(np.searchsorted(self._keys, np.uint64(key)))
+        if i < len(self._keys) and self._keys[i] == key and self.records["depth"][i] >= depth:
+            self.hits += 1
+            return int(self.records["eval"][i]) / 100.0
+        self.misses += 1
+        return None
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
+
+
+_opening_index = None
+_opening_index_loaded = False
+
+
+def get_opening_index():
+    """The index at OPENING_INDEX_PATH, or None when no index has been built."""
+    global _opening_index, _opening_index_loaded
+    if not _opening_index_loaded:
+        _opening_index_loaded = True
+        if os.path.exists(OPENING_INDEX_PATH):
+            try:
+                _opening_index = OpeningIndex(OPENING_INDEX_PATH)
+            except (OSError, ValueError) as e:
+                print(f"Failed to open opening index: {e}")
+    return _opening_index
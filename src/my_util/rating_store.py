@@ -0,0 +1,89 @@
+"""Concurrency-safe rating store on top of a storage backend's conditional writes."""
+
+import asyncio
+import json
+import os
+import random
+import time
+from src.my_util.artifact_store import get_storage_backend
+
+ELO_OBJECT_NAME = "elo_ratings.json"
+DEFAULT_ELO = 1000
+RATING_CACHE_TTL = float(os.getenv("RATING_CACHE_TTL", "30"))
+
+
+def atomic_update_json(backend, object_name, mutate, max_attempts=20):
+    """Read-modify-write a JSON object, retrying if someone else wrote it in between.
+
+    `mutate` receives the current document (an empty dict if missing) and returns the
+    new one. It may be called more than once, so it must not have side effects.
+    """
+    for attempt in range(max_attempts):
+        data, generation = backend.download_with_generation(object_name)
+        document = json.loads(data) if data else {}
+        document = mutate(document)
+        if backend.upload_if_generation(object_name, json.dumps(document), generation):
+            return document
+        time.sleep(random.uniform(0, 0.05 * (attempt + 1)))
+    raise RuntimeError(f"Could not update {object_name} after {max_attempts} attempts")
+
+
+class RatingStore:
+    """Elo ratings keyed by agent URL.
+
+    Updates are atomic per game, so games finishing at the same time never lose an
+    update. Reads are served from an in-memory copy that is refreshed after
+    `cache_ttl` seconds or whenever this process writes.
+    """
+
+    def __init__(self, backend=None, object_name=ELO_OBJECT_NAME, default=DEFAULT_ELO, cache_ttl=RATING_CACHE_TTL):
+        self.backend = backend or get_storage_backend()
+        self.object_name = object_name
+        self.default = default
+        self.cache_ttl = cache_ttl
+        self._ratings = None
+        self._fetched_at = 0.0
+
+    def _load(self):
+        data, _ = self.backend.download_with_generation(self.object_name)
+        return json.loads(data) if data else {}
+
+    async def get_ratings(self, refresh=False):
+        if refresh or self._ratings is None or time.monotonic() - self._fetched_at > self.cache_ttl:
+            self._ratings = await asyncio.to_thread(self._load)
+            self._fetched_at = time.monotonic()
+        return dict(self._ratings)
+
+    async def get(self, url):
+        ratings = await self.get_ratings()
+        return ratings.get(url, self.default)
+
+    async def leaderboard(self):
+        ratings = await self.get_ratings()
+        return sorted(ratings.items(), key=lambda item: -item[1])
+
+    async def update_pair(self, url_1, url_2, compute):
+        """Atomically replace the ratings of two players.
+
+        `compute(elo_1, elo_2)` returns the pair of new ratings.
+        """
+        def mutate(ratings):
+            elo_1 = ratings.get(url_1, self.default)
+            elo_2 = ratings.get(url_2, self.default)
+            ratings[url_1], ratings[url_2] = compute(elo_1, elo_2)
+            return ratings
+
+        ratings = await asyncio.to_thread(atomic_update_json, self.backend, self.object_name, mutate)
+        self._ratings = ratings
+        self._fetched_at = time.monotonic()
+        return dict(ratings)
+
+
+_rating_store = None
+
+
+def get_rating_store():
+    global _rating_store
+    if _rating_store is None:
+        _rating_store = RatingStore()
+    return _rating_store
@@ -0,0 +1,248 @@
+"""Per-game move-quality metrics and constant-memory running aggregates per player.
+
+Evaluations are in pawns from White's point of view, as in GreenAgent.eval_history.
+"""
+
+import math
+import numpy as np
+
+CPL_BUCKETS = ["Overall", "Equal", "Winning", "Losing"]
+# Win-probability loss thresholds (percentage points) for inaccuracies, mistakes and blunders.
+INACCURACY_WPL = 5.0
+MISTAKE_WPL = 10.0
+BLUNDER_WPL = 15.0
+
+
+def new_player_eval():
+    """Empty CPL lists per player and bucket, as written to the player data file."""
+    return {player: {bucket: [] for bucket in CPL_BUCKETS} for player in ["White", "Black"]}
+
+
+def win_percent(evals):
+    """Expected score (0-100) for White at the given pawn evaluations."""
+    centipawns = np.clip(np.asarray(evals, dtype=float) * 100.0, -1000.0, 1000.0)
+    return 50.0 + 50.0 * (2.0 / (1.0 + np.exp(-0.00368208 * centipawns)) - 1.0)
+
+
+def move_accuracy(win_prob_loss):
+    return np.clip(103.1668 * np.exp(-0.04354 * win_prob_loss) - 3.1669, 0.0, 100.0)
+
+
+def move_metrics(eval_history, first_player="White"):
+    """Per-move arrays for a whole game, computed in one vectorized pass."""
+    evals = np.asarray(eval_history, dtype=float)
+    before, after = evals[:-1], evals[1:]
+    white_first = first_player == "White"
+    is_white = (np.arange(len(after)) % 2 == 0) == white_first
+    sign = np.where(is_white, 1.0, -1.0)
+    cpl = sign * (before - after)
+    advantage = sign * before
+    equal = np.abs(before) <= 1
+    wp_before, wp_after = win_percent(before), win_percent(after)
+    mover_before = np.where(is_white, wp_before, 100.0 - wp_before)
+    mover_after = np.where(is_white, wp_after, 100.0 - wp_after)
+    wpl = np.maximum(mover_before - mover_after, 0.0)
+    return {
+        "is_white": is_white,
+        "cpl": cpl,
+        "buckets": {
+            "Overall": np.ones(len(after), dtype=bool),
+            "Equal": equal,
+            "Winning": ~equal & (advantage > 1),
+            "Losing": ~equal & (advantage <= 1),
+        },
+        "win_prob_loss": wpl,
+        "accuracy": move_accuracy(wpl),
+    }
+
+
+def _mean(values):
+    return float(values.mean()) if len(values) else None
+
+
+def game_metrics(eval_history, first_player="White"):
+    """Summary metrics per player ("White"/"Black") for one game."""
+    moves = move_metrics(eval_history, first_player)
+    metrics = {}
+    for player, mask in (("White", moves["is_white"]), ("Black", ~moves["is_white"])):
+        wpl = moves["win_prob_loss"][mask]
+        player_metrics = {
+            "moves": int(mask.sum()),
+            "clp": _mean(moves["cpl"][mask]),
+            "clp_equal": _mean(moves["cpl"][mask & moves["buckets"]["Equal"]]),
+            "clp_winning": _mean(moves["cpl"][mask & moves["buckets"]["Winning"]]),
+            "clp_losing": _mean(moves["cpl"][mask & moves["buckets"]["Losing"]]),
+            "win_prob_loss": _mean(wpl),
+            "accuracy": _mean(moves["accuracy"][mask]),
+            "inaccuracies": int(((wpl >= INACCURACY_WPL) & (wpl < MISTAKE_WPL)).sum()),
+            "mistakes": int(((wpl >= MISTAKE_WPL) & (wpl < BLUNDER_WPL)).sum()),
+            "blunders": int((wpl >= BLUNDER_WPL).sum()),
+        }
+        player_metrics["cpl_values"] = {
+            bucket: moves["cpl"][mask & moves["buckets"][bucket]] for bucket in CPL_BUCKETS
+        }
+        player_metrics["accuracy_values"] = moves["accuracy"][mask]
+        metrics[player] = player_metrics
+    return metrics
+
+
+class RunningStats:
+    """Count, mean, variance, min and max in constant memory (Welford / Chan et al. merge)."""
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, minimum=None, maximum=None):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.min = minimum
+        self.max = maximum
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        if not len(values):
+            return
+        batch = RunningStats(len(values), float(values.mean()), float(((values - values.mean()) ** 2).sum()),
+                             float(values.min()), float(values.max()))
+        self.merge(batch)
+
+    def merge(self, other):
+        if not other.count:
+            return
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.count = total
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def to_dict(self):
+        return {"count": self.count, "mean": self.mean, "m2": self.m2, "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["count"], data["mean"], data["m2"], data["min"], data["max"])
+
+
+class HistogramSketch:
+    """Fixed-bin histogram for approximate percentiles; mergeable and constant size."""
+
+    def __init__(self, low=-10.0, high=30.0, bins=800, counts=None):
+        self.low = low
+        self.high = high
+        self.bins = bins
+        self.counts = np.zeros(bins + 2, dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        if not len(values):
+            return
+        # Index 0 and bins + 1 hold values below `low` and above `high`.
+        idx = np.floor((values - self.low) / (self.high - self.low) * self.bins).astype(np.int64) + 1
+        np.add.at(self.counts, np.clip(idx, 0, self.bins + 1), 1)
+
+    def merge(self, other):
+        self.counts += other.counts
+
+    def quantile(self, q):
+        total = self.counts.sum()
+        if not total:
+            return None
+        idx = int(np.searchsorted(np.cumsum(self.counts), q * total, side="left"))
+        idx = min(max(idx, 1), self.bins)
+        width = (self.high - self.low) / self.bins
+        return self.low + (idx - 0.5) * width
+
+    def to_dict(self):
+        return {"low": self.low, "high": self.high, "bins": self.bins, "counts": self.counts.tolist()}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["low"], data["high"], data["bins"], data["counts"])
+
+
+class PlayerAggregate:
+    """Running totals for one player across any number of games."""
+
+    def __init__(self):
+        self.games = 0
+        self.cpl = {bucket: RunningStats() for bucket in CPL_BUCKETS}
+        self.accuracy = RunningStats()
+        self.cpl_sketch = HistogramSketch()
+        self.inaccuracies = 0
+        self.mistakes = 0
+        self.blunders = 0
+
+    def update(self, player_metrics):
+        self.games += 1
+        for bucket in CPL_BUCKETS:
+            self.cpl[bucket].update(player_metrics["cpl_values"][bucket])
+        self.accuracy.update(player_metrics["accuracy_values"])
+        self.cpl_sketch.update(player_metrics["cpl_values"]["Overall"])
+        self.inaccuracies += player_metrics["inaccuracies"]
+        self.mistakes += player_metrics["mistakes"]
+        self.blunders += player_metrics["blunders"]
+
+    def summary(self):
+        moves = self.cpl["Overall"].count
+        return {
+            "games": self.games,
+            "moves": moves,
+            "clp": self.cpl["Overall"].mean if moves else None,
+            "clp_std": self.cpl["Overall"].std if moves else None,
+            "clp_p50": self.cpl_sketch.quantile(0.5),
+            "clp_p90": self.cpl_sketch.quantile(0.9),
+            "clp_equal": self.cpl["Equal"].mean if self.cpl["Equal"].count else None,
+            "clp_winning": self.cpl["Winning"].mean if self.cpl["Winning"].count else None,
+            "clp_losing": self.cpl["Losing"].mean if self.cpl["Losing"].count else None,
+            "accuracy": self.accuracy.mean if self.accuracy.count else None,
+            "blunders_per_game": self.blunders / self.games if self.games else None,
+            "mistakes_per_game": self.mistakes / self.games if self.games else None,
+        }
+
+    def to_dict(self):
+        return {
+            "games": self.games,
+            "cpl": {bucket: stats.to_dict() for bucket, stats in self.cpl.items()},
+            "accuracy": self.accuracy.to_dict(),
+            "cpl_sketch": self.cpl_sketch.to_dict(),
+            "inaccuracies": self.inaccuracies,
+            "mistakes": self.mistakes,
+            "blunders": self.blunders,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        aggregate = cls()
+        aggregate.games = data["games"]
+        aggregate.cpl = {bucket: RunningStats.from_dict(stats) for bucket, stats in data["cpl"].items()}
+        aggregate.accuracy = RunningStats.from_dict(data["accuracy"])
+        aggregate.cpl_sketch = HistogramSketch.from_dict(data["cpl_sketch"])
+        aggregate.inaccuracies = data["inaccuracies"]
+        aggregate.mistakes = data["mistakes"]
+        aggregate.blunders = data["blunders"]
+        return aggregate
+
+
+def update_aggregates(document, game_players, metrics):
+    """Fold one game's metrics into a {player: aggregate dict} document.
+
+    `game_players` maps "White"/"Black" to the player key (e.g. agent URL).
+    """
+    for side, player in game_players.items():
+        aggregate = PlayerAggregate.from_dict(document[player]) if player in document else PlayerAggregate()
+        aggregate.update(metrics[side])
+        document[player] = aggregate.to_dict()
+    return document
+
+
+def public_metrics(player_metrics):
+    """Drop the per-move arrays, leaving JSON-serializable summary values."""
+    return {k: v for k, v in player_metrics.items() if k not in ("cpl_values", "accuracy_values")}
@@ -0,0 +1,57 @@
+"""Per-phase wall-clock timings, collected process-wide for benchmarking."""
+
+import contextlib
+import os
+import time
+from collections import defaultdict, deque
+import numpy as np
+from src.my_util.metrics import PHASE_SECONDS
+
+# Phases recorded by the green agent:
+# prompt: building the move prompt; agent: white agent round-trip; parse: parsing and
+# applying the answer; move: a whole move including retries; eval_wait: waiting for the
+# game's engine (session lock and pool checkout); eval: the engine search for one position
+# (cache and opening index hits are not timed); flush: appending buffered records to the
+# game journal; finish: writing the game files; upload: storing artifacts and ratings.
+PHASES = ("prompt", "agent", "parse", "move", "eval_wait", "eval", "flush", "finish", "upload")
+# Samples kept per phase for percentiles; older ones are dropped in long-running servers.
+TIMING_MAX_SAMPLES = int(os.getenv("TIMING_MAX_SAMPLES", "100000"))
+
+
+class PhaseTimings:
+    """Lists of durations (seconds) per phase. Every sample is also exported on /metrics."""
+
+    def __init__(self, max_samples=TIMING_MAX_SAMPLES):
+        self.samples = defaultdict(lambda: deque(maxlen=max_samples))
+
+    def add(self, phase, seconds):
+        self.samples[phase].append(seconds)
+        PHASE_SECONDS.observe(seconds, phase=phase)
+
+    @contextlib.contextmanager
+    def span(self, phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, time.perf_counter() - start)
+
+    def reset(self):
+        self.samples.clear()
+
+    def summary(self, percentiles=(50, 95, 99)):
+        """{phase: {"count", "mean_ms", "p50_ms", ...}} for every phase with samples."""
+        result = {}
+        for phase, values in self.samples.items():
+            values = np.asarray(values) * 1000.0
+            result[phase] = {"count": len(values), "mean_ms": round(float(values.mean()), 3)}
+            for p, value in zip(percentiles, np.percentile(values, percentiles)):
+                result[phase][f"p{p}_ms"] = round(float(value), 3)
+        return result
+
+
+_timings = PhaseTimings()
+
+
+def get_timings():
+    return _timings
@@ -1,16 +1,17 @@
 import chess
+import chess.engine
 import chess.pgn
 import pyspiel
-import requests
-import json
 import os
-import atexit
-from google.cloud import storage
+import asyncio
+import contextlib
+import collections
 
 GAME_FILE="game.pgn"
 GAME_DATA_FILE="game_data.json"
 GAME_EVAL_FILE="game_eval.json"
 PLAYER_DATA_FILE="player_data.json"
+GAME_JOURNAL_FILE="game_journal.jsonl"
 
 # Source: https://github.com/google-deepmind/game_arena/tree/main
 def get_pgn(target_state, player_names=None) -> chess.pgn.Game:
@@ -47,6 +48,8 @@ def get_pgn(target_state, player_names=None) -> chess.pgn.Game:
     return pgn_game
 
 def post_chess_api(data=None):
+    import requests
+
     if data is None:
         data = {}
     response = requests.post(
@@ -57,61 +60,147 @@ def post_chess_api(data=None):
     return response.json()
 
 ENGINE_PATH = "engines/stockfish-mac"
-_engine = None
 
-def get_engine():
-    global _engine
-    if _engine is None:
+def score_to_pawns(score):
+    cp = score.pov(chess.WHITE).score(mate_score=1500)
+    return cp / 100.0
+
+ENGINE_POOL_SIZE = int(os.getenv("ENGINE_POOL_SIZE", str(os.cpu_count() or 1)))
+ENGINE_THREADS = int(os.getenv("ENGINE_THREADS", "1"))
+ENGINE_HASH_MB = int(os.getenv("ENGINE_HASH_MB", "64"))
+
+class EnginePool:
+    """Pool of UCI engine processes driven through python-chess's asyncio API.
+
+    Engines are started lazily, up to `size`, and each one is configured with
+    `threads` search threads and `hash_mb` of transposition table. A pool is bound
+    to the event loop it was first used on.
+    """
+
+    def __init__(self, size=None, threads=None, hash_mb=None, engine_path=None):
+        self.size = max(1, size or ENGINE_POOL_SIZE)
+        self.threads = threads or ENGINE_THREADS
+        self.hash_mb = hash_mb or ENGINE_HASH_MB
+        self.engine_path = engine_path or ENGINE_PATH
+        self._loop = None
+        self._idle = []
+        self._waiters = collections.deque()
+        self._engines = []
+        self._launching = 0
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Engines started on another (finished) loop cannot be driven from this one,
+            # so their processes are killed rather than quit.
+            for engine in self._engines:
+                try:
+                    engine.transport.kill()
+                except Exception as e:
+                    print(f"Failed to kill chess engine: {e}")
+            self._loop = loop
+            self._idle = []
+            self._waiters = collections.deque()
+            self._engines = []
+            self._launching = 0
+
+    async def _launch(self):
+        self._launching += 1
         try:
-            _engine = chess.engine.SimpleEngine.popen_uci(ENGINE_PATH)
+            _, engine = await chess.engine.popen_uci(self.engine_path)
+            await engine.configure({"Threads": self.threads, "Hash": self.hash_mb})
         except Exception as e:
             raise RuntimeError(f"Failed to start chess engine: {e}")
-    return _engine
-
-def close_engine():
-    global _engine
-    if _engine is not None:
+        finally:
+            self._launching -= 1
+        self._engines.append(engine)
+        return engine
+
+    async def acquire(self, prefer=None):
+        """Take an idle engine, preferring `prefer` (e.g. the engine whose hash is warm for a game)."""
+        self._bind_loop()
+        if self._idle:
+            engine = prefer if prefer in self._idle else self._idle[-1]
+            self._idle.remove(engine)
+            return engine
+        while True:
+            if len(self._engines) + self._launching < self.size:
+                try:
+                    return await self._launch()
+                except Exception:
+                    # The slot is free again; let the next waiter try.
+                    self._wake_waiter(None)
+                    raise
+            waiter = self._loop.create_future()
+            self._waiters.append(waiter)
+            try:
+                engine = await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    if waiter.result() is None:
+                        self._wake_waiter(None)
+                    else:
+                        self.release(waiter.result())
+                raise
+            # None means an engine was discarded or failed to start: launch a replacement.
+            if engine is not None:
+                return engine
+
+    def _wake_waiter(self, engine):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(engine)
+                return True
+        return False
+
+    def release(self, engine):
+        if engine not in self._engines:
+            return
+        if not self._wake_waiter(engine):
+            self._idle.append(engine)
+
+    def discard(self, engine):
+        if engine in self._engines:
+            self._engines.remove(engine)
+            self._wake_waiter(None)
+        if engine in self._idle:
+            self._idle.remove(engine)
+
+    @contextlib.asynccontextmanager
+    async def engine(self, prefer=None):
+        engine = await self.acquire(prefer)
         try:
-            _engine.quit()
-        except Exception as e:
-            print(f"Failed to quit chess engine: {e}")
-        _engine = None
-
-atexit.register(close_engine)
-
-def get_engine_eval(fen, depth=15):
-    engine = get_engine()
-    board = chess.Board(fen)
-    info = engine.analyse(board, chess.engine.Limit(depth=depth))
-    score = info["score"].pov(chess.WHITE)
-    cp = score.score(mate_score=1500)
-    eval_pawns = cp / 100.0
-    return eval_pawns
-
-BUCKET_NAME = os.environ["AGENT_BUCKET"]
-
-def save_state_to_gcs(state, object_name):
-    client = storage.Client()
-    bucket = client.bucket(BUCKET_NAME)
-    blob = bucket.blob(object_name)
-
-    payload = json.dumps(state)
-    blob.upload_from_string(payload, content_type="application/json")
-
-def save_pgn_to_gcs(pgn_text, object_name):
-    client = storage.Client()
-    bucket = client.bucket(BUCKET_NAME)
-    blob = bucket.blob(object_name)
-
-    blob.upload_from_string(pgn_text, content_type="application/x-chess-pgn")
-
-def load_state_from_gcs(object_name):
-    client = storage.Client()
-    bucket = client.bucket(BUCKET_NAME)
-    blob = bucket.blob(object_name)
-
-    if not blob.exists():
-        return None
-
-    contents = blob.download_as_text()
-    return json.loads(contents)
+            yield engine
+        except chess.engine.EngineTerminatedError:
+            self.discard(engine)
+            raise
+        finally:
+            self.release(engine)
+
+    async def analyse(self, board, limit, game=None):
+        async with self.engine() as engine:
+            return await engine.analyse(board, limit, game=game)
+
+    async def close(self):
+        engines, self._engines = self._engines, []
+        self._idle = []
+        for engine in engines:
+            try:
+                await engine.quit()
+            except Exception as e:
+                print(f"Failed to quit chess engine: {e}")
+
+_engine_pool = None
+
+def get_engine_pool():
+    global _engine_pool
+    if _engine_pool is None:
+        _engine_pool = EnginePool()
+    return _engine_pool
+
+async def close_engine_pool():
+    global _engine_pool
+    if _engine_pool is not None:
+        await _engine_pool.close()
+        _engine_pool = None
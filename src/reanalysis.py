@@ -0,0 +1,187 @@
+"""Batch re-analysis of stored games across a process pool of engines."""
+
+import io
+import itertools
+import json
+import math
+import os
+import chess
+import chess.engine
+import chess.pgn
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from src.my_util import utils
+from src.my_util.artifact_store import GCSBackend
+from src.my_util.eval_cache import get_eval_cache
+from src.my_util.opening_index import OPENING_INDEX_PATH, position_key, write_opening_index
+from src.my_util.stats import game_metrics, public_metrics
+
+# Positions analysed by one engine process before it is quit.
+CHUNK_SIZE = 64
+
+
+def _analyse_chunk(job):
+    engine_path, threads, hash_mb, limit, fens = job
+    # The engine is quit before the chunk returns: a SimpleEngine left open keeps a
+    # non-daemon thread running, and the worker process could never exit.
+    with chess.engine.SimpleEngine.popen_uci(engine_path) as engine:
+        engine.configure({"Threads": threads, "Hash": hash_mb})
+        return [
+            utils.score_to_pawns(engine.analyse(chess.Board(fen), chess.engine.Limit(**limit))["score"])
+            for fen in fens
+        ]
+
+
+def analyse_fens(fens, limit, workers=None, threads=1, hash_mb=utils.ENGINE_HASH_MB, engine_path=None):
+    """Evaluate `fens` (in pawns, White's point of view) across a process pool, in order."""
+    if not fens:
+        return []
+    workers = min(workers or os.cpu_count(), len(fens))
+    size = min(CHUNK_SIZE, math.ceil(len(fens) / workers))
+    jobs = [
+        (engine_path or utils.ENGINE_PATH, threads, hash_mb, limit, fens[i:i + size])
+        for i in range(0, len(fens), size)
+    ]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return [value for chunk in executor.map(_analyse_chunk, jobs) for value in chunk]
+
+
+def load_pgns(source):
+    """Return [(name, pgn_text)] from a local directory or a gs://bucket/prefix location."""
+    if source.startswith("gs://"):
+        bucket_name, _, prefix = source[len("gs://"):].partition("/")
+        backend = GCSBackend(bucket_name)
+        names = [name for name in backend.list(prefix) if name.endswith(".pgn")]
+        return [(name, backend.download(name).decode("utf-8")) for name in names]
+    if os.path.isfile(source):
+        with open(source, "r", encoding="utf-8") as f:
+            return [(os.path.basename(source), f.read())]
+    names = sorted(name for name in os.listdir(source) if name.endswith(".pgn"))
+    pgns = []
+    for name in names:
+        with open(os.path.join(source, name), "r", encoding="utf-8") as f:
+            pgns.append((name, f.read()))
+    return pgns
+
+
+def game_positions(pgn_text):
+    """Return (game, fens, movers) for every game in a PGN text.
+
+    fens holds the start position followed by the position after each move, and
+    movers[i] is the side ("White"/"Black") that played move i.
+    """
+    games = []
+    handle = io.StringIO(pgn_text)
+    while (game := chess.pgn.read_game(handle)) is not None:
+        board = game.board()
+        fens = [board.fen()]
+        movers = []
+        for move in game.mainline_moves():
+            movers.append("White" if board.turn == chess.WHITE else "Black")
+            board.push(move)
+            fens.append(board.fen())
+        games.append((game, fens, movers))
+    return games
+
+
+def reanalyse(source, out_dir="reanalysis", depth=25, nodes=None, workers=None,
+              threads=1, hash_mb=utils.ENGINE_HASH_MB, engine_path=None):
+    limit = {"nodes": nodes} if nodes else {"depth": depth}
+    limit_name = f"n{nodes}" if nodes else f"d{depth}"
+    os.makedirs(out_dir, exist_ok=True)
+
+    games = []
+    for name, pgn_text in load_pgns(source):
+        for index, (game, fens, movers) in enumerate(game_positions(pgn_text)):
+            games.append((name, index, game, fens, movers))
+    # Positions are searched once, and only if not already cached at this depth.
+    cache = get_eval_cache() if not nodes else None
+    positions = list(dict.fromkeys(fen for _, _, _, fens, _ in games for fen in fens))
+    known = {}
+    if cache is not None:
+        for fen in positions:
+            value = cache.get(fen, depth)
+            if value is not None:
+                known[fen] = value
+    todo = [fen for fen in positions if fen not in known]
+    print(f"Re-analysing {len(games)} games ({len(positions)} positions, {len(known)} cached) at {limit}...")
+
+    evals = analyse_fens(todo, limit, workers, threads, hash_mb, engine_path)
+    for fen, value in zip(todo, evals):
+        known[fen] = value
+        if cache is not None:
+            cache.put(fen, depth, value)
+
+    for name, index, game, fens, movers in games:
+        eval_history = [known[fen] for fen in fens]
+        first_player = movers[0] if movers else "White"
+        metrics = game_metrics(eval_history, first_player)
+        summary = {player: public_metrics(player_metrics) for player, player_metrics in metrics.items()}
+        stem = name.rsplit("/", 1)[-1][:-len(".pgn")]
+        if index:
+            stem = f"{stem}_{index}"
+        output = {
+            "source": name,
+            "white": game.headers.get("White"),
+            "black": game.headers.get("Black"),
+            "result": game.headers.get("Result"),
+            "limit": limit,
+            "eval_history": eval_history,
+            "summary": summary,
+        }
+        with open(os.path.join(out_dir, f"{stem}_reanalysis_{limit_name}.json"), "w") as f:
+            json.dump(output, f, indent=4)
+        print(f"{name}: White clp {summary['White']['clp']}, Black clp {summary['Black']['clp']}")
+    return len(games)
+
+
+def _walk_move_tree(board, tree, plies, counts, fens):
+    key = position_key(board)
+    counts[key] += 1
+    fens.setdefault(key, board.fen())
+    if plies == 0 or not tree:
+        return
+    for san, subtree in tree.items():
+        board.push_san(san)
+        _walk_move_tree(board, subtree, plies - 1, counts, fens)
+        board.pop()
+
+
+def opening_positions(source, plies=10, min_count=1):
+    """Return {zobrist key: fen} for positions within the first `plies` plies.
+
+    The source is a PGN file, a directory or gs:// location of PGN files, or a JSON
+    move tree of nested SAN moves ({"e4": {"e5": {}, "c5": {}}, "d4": {}}). With
+    `min_count`, only positions reached in at least that many games (or tree
+    branches) are kept.
+    """
+    counts = Counter()
+    fens = {}
+    if source.endswith(".json"):
+        with open(source, "r", encoding="utf-8") as f:
+            _walk_move_tree(chess.Board(), json.load(f), plies, counts, fens)
+    else:
+        for _, pgn_text in load_pgns(source):
+            handle = io.StringIO(pgn_text)
+            while (game := chess.pgn.read_game(handle)) is not None:
+                board = game.board()
+                seen = {position_key(board): board.fen()}
+                for move in itertools.islice(game.mainline_moves(), plies):
+                    board.push(move)
+                    seen[position_key(board)] = board.fen()
+                counts.update(seen.keys())
+                for key, fen in seen.items():
+                    fens.setdefault(key, fen)
+    return {key: fen for key, fen in fens.items() if counts[key] >= min_count}
+
+
+def build_opening_index(source, out=OPENING_INDEX_PATH, plies=10, depth=20, min_count=1, workers=None,
+                        threads=1, hash_mb=utils.ENGINE_HASH_MB, engine_path=None):
+    positions = opening_positions(source, plies, min_count)
+    print(f"Analysing {len(positions)} opening positions at depth {depth}...")
+    evals = analyse_fens(list(positions.values()), {"depth": depth}, workers, threads, hash_mb, engine_path)
+    count = write_opening_index(
+        {key: (depth, value) for key, value in zip(positions, evals)}, out
+    )
+    print(f"Wrote {count} positions to {out}")
+    return count
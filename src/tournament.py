@@ -0,0 +1,185 @@
+"""Tournament module - schedules many games between a list of agents concurrently."""
+
+import asyncio
+import itertools
+import json
+import uuid
+from collections import Counter
+from src.green_agent.agent import ask_agent_to_solve, PLAYER_STATS_OBJECT_NAME
+from src.green_agent.session import open_session, close_session
+from src.my_util.artifact_store import get_storage_backend
+from src.my_util.rating_store import get_rating_store
+from src.my_util.stats import PlayerAggregate
+
+FORMATS = ("round_robin", "gauntlet", "swiss")
+
+
+def round_robin_pairings(urls, double=True):
+    pairings = []
+    for white, black in itertools.combinations(urls, 2):
+        pairings.append((white, black))
+        if double:
+            pairings.append((black, white))
+    return pairings
+
+
+def gauntlet_pairings(urls, double=True):
+    # The first agent plays every other agent.
+    challenger, opponents = urls[0], urls[1:]
+    pairings = []
+    for opponent in opponents:
+        pairings.append((challenger, opponent))
+        if double:
+            pairings.append((opponent, challenger))
+    return pairings
+
+
+def swiss_pairings(urls, points, played, white_counts, byes=()):
+    """Pair agents with equal or nearest scores who have not met yet.
+
+    Returns (pairings, bye) where bye is the agent left without an opponent, if any.
+    """
+    ranked = sorted(urls, key=lambda url: (-points[url], urls.index(url)))
+    pairings = []
+    bye = None
+    if len(ranked) % 2 == 1:
+        # Lowest-ranked agent that has not had a bye yet gets it.
+        bye = next((url for url in reversed(ranked) if url not in byes), ranked[-1])
+        ranked.remove(bye)
+    while ranked:
+        first = ranked.pop(0)
+        opponent = next((url for url in ranked if frozenset((first, url)) not in played), ranked[0])
+        ranked.remove(opponent)
+        if white_counts[first] <= white_counts[opponent]:
+            pairings.append((first, opponent))
+        else:
+            pairings.append((opponent, first))
+    return pairings, bye
+
+
+class Tournament:
+    """Runs a tournament, streaming game results as they finish.
+
+    At most `max_concurrency` games run at once, and each agent plays in at most
+    `per_agent_limit` games at a time. A game is only started once both of its
+    agents are free, so games waiting on a busy agent don't hold up the others.
+    """
+
+    def __init__(self, urls, fmt="round_robin", rounds=None, max_concurrency=4, per_agent_limit=1,
+                 double=True, play_game=ask_agent_to_solve):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown tournament format: {fmt}")
+        urls = list(dict.fromkeys(urls))
+        if len(urls) < 2:
+            raise ValueError("A tournament needs at least two agents")
+        self.urls = urls
+        self.fmt = fmt
+        self.rounds = rounds or max(1, (len(urls) - 1).bit_length() + 1)
+        self.double = double
+        self.play_game = play_game
+        # Games write their files to GAME_OUTPUT_DIR/<tournament id>-r<round>-<game>/.
+        self.id = uuid.uuid4().hex[:12]
+        self._games = itertools.count(1)
+        self.max_concurrency = max_concurrency
+        self.per_agent_limit = per_agent_limit
+        # Games each agent is playing right now.
+        self._busy = Counter()
+        self.points = {url: 0.0 for url in self.urls}
+        self.played = set()
+        self.white_counts = {url: 0 for url in self.urls}
+        self.byes = set()
+        self.results = []
+
+    def _can_start(self, white, black):
+        return self._busy[white] < self.per_agent_limit and self._busy[black] < self.per_agent_limit
+
+    async def _play(self, round_num, white, black):
+        # Called by _run_round once both agents have a free slot, which it has already taken.
+        session = open_session(f"{self.id}-r{round_num}-{next(self._games)}", white, black)
+        try:
+            game_result, elo, _ = await self.play_game(white, black, session=session)
+            error = None
+        except Exception as e:
+            game_result, elo, error = None, None, str(e)
+        finally:
+            close_session(session.id)
+            self._busy[white] -= 1
+            self._busy[black] -= 1
+        result = {
+            "round": round_num,
+            "output_dir": session.output_dir,
+            "white": white,
+            "black": black,
+            "result": game_result,
+            "elo": {white: elo[white], black: elo[black]} if elo else None,
+            "error": error,
+        }
+        if game_result is not None:
+            self.points[white] += game_result[0]
+            self.points[black] += game_result[1]
+        self.results.append(result)
+        return result
+
+    async def _run_round(self, round_num, pairings):
+        # Pairings start in order, skipping over those whose agents are busy, whenever a game slot is free.
+        waiting = list(pairings)
+        running = set()
+        try:
+            while waiting or running:
+                for white, black in list(waiting):
+                    if len(running) >= self.max_concurrency:
+                        break
+                    if self._can_start(white, black):
+                        waiting.remove((white, black))
+                        self._busy[white] += 1
+                        self._busy[black] += 1
+                        running.add(asyncio.create_task(self._play(round_num, white, black)))
+                done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in running:
+                task.cancel()
+
+    async def run(self):
+        if self.fmt == "round_robin":
+            async for result in self._run_round(1, round_robin_pairings(self.urls, self.double)):
+                yield result
+        elif self.fmt == "gauntlet":
+            async for result in self._run_round(1, gauntlet_pairings(self.urls, self.double)):
+                yield result
+        else:
+            for round_num in range(1, self.rounds + 1):
+                pairings, bye = swiss_pairings(
+                    self.urls, self.points, self.played, self.white_counts, self.byes
+                )
+                if bye is not None:
+                    self.byes.add(bye)
+                    self.points[bye] += 1.0
+                for white, black in pairings:
+                    self.played.add(frozenset((white, black)))
+                    self.white_counts[white] += 1
+                async for result in self._run_round(round_num, pairings):
+                    yield result
+
+    def standings(self):
+        return sorted(self.points.items(), key=lambda item: -item[1])
+
+
+async def run_tournament(urls, fmt="round_robin", rounds=None, max_concurrency=4, per_agent_limit=1):
+    tournament = Tournament(urls, fmt, rounds, max_concurrency, per_agent_limit)
+    async for result in tournament.run():
+        print(f"Game finished: {result}")
+    print("Final standings:")
+    for rank, (url, points) in enumerate(tournament.standings(), start=1):
+        print(f"{rank}. {url}: {points}")
+    return tournament
+
+
+async def print_leaderboard():
+    ratings = await get_rating_store().leaderboard()
+    data = await asyncio.to_thread(get_storage_backend().download, PLAYER_STATS_OBJECT_NAME)
+    aggregates = json.loads(data) if data else {}
+    for rank, (url, elo) in enumerate(ratings, start=1):
+        summary = PlayerAggregate.from_dict(aggregates[url]).summary() if url in aggregates else {}
+        print(f"{rank}. {url}: elo {elo:.1f} {summary}")
@@ -2,15 +2,23 @@
 
 import uvicorn
 import dotenv
+import asyncio
+import contextlib
+import math
 import os
+import time
+import weakref
 from a2a.server.apps import A2AStarletteApplication
 from a2a.server.request_handlers import DefaultRequestHandler
 from a2a.server.agent_execution import AgentExecutor, RequestContext
 from a2a.server.events import EventQueue
 from a2a.server.tasks import InMemoryTaskStore
-from a2a.types import AgentSkill, AgentCard, AgentCapabilities
+from a2a.types import AgentSkill, AgentCard, AgentCapabilities, AgentExtension
 from a2a.utils import new_agent_text_message
-from litellm import completion
+from src.white_agent.memory import ConversationMemory
+from src.white_agent.llm_client import get_llm_client, warm_up_litellm, REGISTRY
+from src.my_util.metrics import metrics_routes
+from src.my_util.my_a2a import GAME_OVER_EXTENSION
 
 
 dotenv.load_dotenv()
@@ -31,41 +39,56 @@ def prepare_white_agent_card(url):
         version="1.0.0",
         default_input_modes=["text/plain"],
         default_output_modes=["text/plain"],
-        capabilities=AgentCapabilities(),
+        capabilities=AgentCapabilities(extensions=[
+            AgentExtension(uri=GAME_OVER_EXTENSION, description="Drops the game's conversation on the game_over notice."),
+        ]),
         skills=[skill],
     )
     return card
 
 
+def move_priority(message):
+    """Queue priority of a move request: its deadline, when the green agent sent its move budget."""
+    metadata = (message.metadata if message is not None else None) or {}
+    budget = metadata.get("move_budget")
+    return time.monotonic() + float(budget) if budget is not None else math.inf
+
+
+def is_game_over(message):
+    """Whether the message is the green agent's notice that the context's game has ended."""
+    metadata = (message.metadata if message is not None else None) or {}
+    return bool(metadata.get("game_over"))
+
+
 class GeneralWhiteAgentExecutor(AgentExecutor):
-    def __init__(self):
-        self.ctx_id_to_messages = {}
+    def __init__(self, client=None):
+        self.memory = ConversationMemory()
+        self.client = client or get_llm_client()
+        # One lock per live context keeps each game's moves strictly in order.
+        self._context_locks = weakref.WeakValueDictionary()
+
+    def _context_lock(self, context_id):
+        lock = self._context_locks.get(context_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._context_locks[context_id] = lock
+        return lock
 
     async def execute(self, context: RequestContext, event_queue: EventQueue) -> None:
         # parse the task
+        if is_game_over(context.message):
+            async with self._context_lock(context.context_id):
+                self.memory.forget(context.context_id)
+            await event_queue.enqueue_event(new_agent_text_message("Game over.", context_id=context.context_id))
+            return
         user_input = context.get_user_input()
-        if context.context_id not in self.ctx_id_to_messages:
-            self.ctx_id_to_messages[context.context_id] = []
-        messages = self.ctx_id_to_messages[context.context_id]
-        messages.append(
-            {
-                "role": "user",
-                "content": user_input,
-            }
-        )
-        response = completion(
-            messages=messages,
-            model="openai/gpt-5.1",
-            custom_llm_provider="openai",
-            temperature=1,
-        )
-        next_message = response.choices[0].message.model_dump()  # type: ignore
-        messages.append(
-            {
-                "role": "assistant",
-                "content": next_message["content"],
-            }
-        )
+        priority = move_priority(context.message)
+        async with self._context_lock(context.context_id):
+            messages = self.memory.messages_for(context.context_id, user_input)
+            # Moves closest to their deadline are sent to the LLM first.
+            response = await self.client.complete(messages, priority)
+            next_message = response.choices[0].message.model_dump()  # type: ignore
+            self.memory.record(context.context_id, user_input, next_message["content"])
         await event_queue.enqueue_event(
             new_agent_text_message(
                 next_message["content"], context_id=context.context_id
@@ -73,7 +96,16 @@ class GeneralWhiteAgentExecutor(AgentExecutor):
         )
 
     async def cancel(self, context, event_queue) -> None:
-        raise NotImplementedError
+        # Moves are answered directly rather than as tasks, so there is no running work to stop.
+        self.memory.forget(context.context_id)
+
+
+@contextlib.asynccontextmanager
+async def warm_up_lifespan(app):
+    # Serve the agent card right away and import litellm in the background.
+    # The first moves wait on the same import instead of starting another one.
+    warm_up_litellm()
+    yield
 
 
 def start_white_agent(agent_name="general_white_agent", host="localhost", port=9002, local=False):
@@ -95,4 +127,4 @@ def start_white_agent(agent_name="general_white_agent", host="localhost", port=9
         http_handler=request_handler,
     )
 
-    uvicorn.run(app.build(), host=host, port=port)
+    uvicorn.run(app.build(routes=metrics_routes(REGISTRY), lifespan=warm_up_lifespan), host=host, port=port)
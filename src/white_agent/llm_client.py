@@ -0,0 +1,140 @@
+"""Shared LLM client per model, serving the moves of every game the white agent plays."""
+
+import asyncio
+import importlib
+import math
+import os
+import time
+import httpx
+from src.my_util.metrics import Registry
+from src.white_agent.rate_limit import get_bucket, PriorityLimiter
+
+WHITE_AGENT_MODEL = os.getenv("WHITE_AGENT_MODEL", "openai/gpt-5.1")
+WHITE_AGENT_PROVIDER = os.getenv("WHITE_AGENT_PROVIDER", "openai")
+WHITE_AGENT_MAX_CONCURRENCY = int(os.getenv("WHITE_AGENT_MAX_CONCURRENCY", "16"))
+# Rate-limited requests are queued again up to this many times before the error is returned.
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_KEEPALIVE_SECONDS = float(os.getenv("LLM_KEEPALIVE_SECONDS", "60"))
+
+# Served on the white agent's /metrics, separately from the green agent's metrics.
+REGISTRY = Registry()
+QUEUE_DEPTH = REGISTRY.gauge("white_llm_queue_depth", "Move requests waiting for an LLM slot.", ("model",))
+IN_FLIGHT = REGISTRY.gauge("white_llm_in_flight", "LLM calls in flight.", ("model",))
+QUEUE_SECONDS = REGISTRY.histogram(
+    "white_llm_queue_seconds", "Time a move request waited for a slot and a rate-limit token.", ("model",)
+)
+LLM_SECONDS = REGISTRY.histogram("white_llm_seconds", "LLM call latency.", ("model",))
+RATE_LIMITED = REGISTRY.counter("white_llm_rate_limited_total", "Rate-limit responses from the provider.", ("model",))
+REQUEST_RATE = REGISTRY.gauge(
+    "white_llm_requests_per_second", "Current request rate limit per provider (0 = unlimited).", ("provider",)
+)
+
+
+# litellm takes seconds to import, so it is loaded lazily, once, in a thread.
+_litellm = None
+_litellm_import = None
+
+
+def warm_up_litellm():
+    """Start importing litellm in the background (if not already started) and return the import task."""
+    global _litellm_import
+    if _litellm_import is None or _litellm_import.get_loop() is not asyncio.get_running_loop():
+        _litellm_import = asyncio.ensure_future(asyncio.to_thread(importlib.import_module, "litellm"))
+    return _litellm_import
+
+
+async def load_litellm():
+    global _litellm
+    if _litellm is None:
+        # Shielded so a cancelled move does not cancel the import other moves are waiting on.
+        _litellm = await asyncio.shield(warm_up_litellm())
+    return _litellm
+
+
+def _retry_after(error):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMClient:
+    """Completions for one model, shared by all games.
+
+    Requests wait for one of `max_concurrency` slots, lowest priority value first
+    (the green agent's move deadline), then for a token from the provider's bucket.
+    A rate-limit response backs the bucket off and puts the request back in the queue.
+    """
+
+    def __init__(self, model=WHITE_AGENT_MODEL, provider=WHITE_AGENT_PROVIDER,
+                 max_concurrency=WHITE_AGENT_MAX_CONCURRENCY, max_retries=LLM_MAX_RETRIES):
+        self.model = model
+        self.provider = provider
+        self.bucket = get_bucket(provider)
+        self.limiter = PriorityLimiter(max_concurrency)
+        self.max_retries = max_retries
+        self._openai_client = None
+
+    def _client(self):
+        # OpenAI calls reuse one keep-alive connection pool instead of a client per call.
+        # openai is already imported by litellm.
+        if self._openai_client is None and self.provider == "openai":
+            openai = importlib.import_module("openai")
+            limits = httpx.Limits(
+                max_connections=self.limiter.limit,
+                max_keepalive_connections=self.limiter.limit,
+                keepalive_expiry=LLM_KEEPALIVE_SECONDS,
+            )
+            # Retries are left to complete(), so they go through the queue and the bucket.
+            self._openai_client = openai.AsyncOpenAI(http_client=httpx.AsyncClient(limits=limits), max_retries=0)
+        return self._openai_client
+
+    async def complete(self, messages, priority=math.inf):
+        litellm = await load_litellm()
+        for attempt in range(self.max_retries + 1):
+            queued = time.perf_counter()
+            QUEUE_DEPTH.inc(model=self.model)
+            try:
+                await self.limiter.acquire(priority)
+            finally:
+                QUEUE_DEPTH.dec(model=self.model)
+            try:
+                await self.bucket.acquire()
+                QUEUE_SECONDS.observe(time.perf_counter() - queued, model=self.model)
+                started = time.perf_counter()
+                IN_FLIGHT.inc(model=self.model)
+                try:
+                    response = await litellm.acompletion(
+                        messages=messages,
+                        model=self.model,
+                        custom_llm_provider=self.provider,
+                        temperature=1,
+                        client=self._client(),
+                    )
+                finally:
+                    IN_FLIGHT.dec(model=self.model)
+            except litellm.RateLimitError as e:
+                RATE_LIMITED.inc(model=self.model)
+                self.bucket.backoff(_retry_after(e))
+                REQUEST_RATE.set(self.bucket.rate, provider=self.provider)
+                print(f"Rate limited by {self.provider} (attempt {attempt + 1}), "
+                      f"now {self.bucket.rate:.2f} requests/sec")
+                if attempt == self.max_retries:
+                    raise
+                continue
+            finally:
+                self.limiter.release()
+            LLM_SECONDS.observe(time.perf_counter() - started, model=self.model)
+            self.bucket.recover()
+            REQUEST_RATE.set(self.bucket.rate, provider=self.provider)
+            return response
+
+
+_clients = {}
+
+
+def get_llm_client(model=WHITE_AGENT_MODEL):
+    if model not in _clients:
+        _clients[model] = LLMClient(model)
+    return _clients[model]
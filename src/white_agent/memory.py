@@ -0,0 +1,60 @@
+"""Bounded per-context conversation memory for the white agent."""
+
+import os
+import time
+from collections import OrderedDict
+
+# full: resend the whole conversation; window: only the last HISTORY_WINDOW turns;
+# stateless: only the current prompt (it already holds the position and move list).
+HISTORY_POLICY = os.getenv("HISTORY_POLICY", "full")
+HISTORY_POLICIES = ("full", "window", "stateless")
+HISTORY_WINDOW = int(os.getenv("HISTORY_WINDOW", "4"))
+CONTEXT_IDLE_TTL = float(os.getenv("CONTEXT_IDLE_TTL", "1800"))
+MAX_CONTEXTS = int(os.getenv("MAX_CONTEXTS", "1000"))
+
+
+class ConversationMemory:
+    """Message history per A2A context id.
+
+    Contexts idle for longer than `idle_ttl` seconds are dropped, and at most
+    `max_contexts` are kept (least recently used first out).
+    """
+
+    def __init__(self, policy=HISTORY_POLICY, window=HISTORY_WINDOW, idle_ttl=CONTEXT_IDLE_TTL,
+                 max_contexts=MAX_CONTEXTS):
+        if policy not in HISTORY_POLICIES:
+            raise ValueError(f"Unknown history policy: {policy}")
+        self.policy = policy
+        self.window = window
+        self.idle_ttl = idle_ttl
+        self.max_contexts = max_contexts
+        self._contexts = OrderedDict()
+
+    def __len__(self):
+        return len(self._contexts)
+
+    def _evict(self, now):
+        while self._contexts:
+            context_id, (_, last_used) = next(iter(self._contexts.items()))
+            if now - last_used <= self.idle_ttl and len(self._contexts) <= self.max_contexts:
+                break
+            del self._contexts[context_id]
+
+    def messages_for(self, context_id, user_input):
+        """Return the messages to send to the model for a new user prompt."""
+        history = self._contexts.get(context_id, ([], 0))[0]
+        return history + [{"role": "user", "content": user_input}]
+
+    def record(self, context_id, user_input, reply):
+        now = time.monotonic()
+        history = self._contexts.pop(context_id, ([], 0))[0]
+        if self.policy != "stateless":
+            history.append({"role": "user", "content": user_input})
+            history.append({"role": "assistant", "content": reply})
+            if self.policy == "window":
+                del history[:max(len(history) - 2 * self.window, 0)]
+        self._contexts[context_id] = (history, now)
+        self._evict(now)
+
+    def forget(self, context_id):
+        self._contexts.pop(context_id, None)
@@ -0,0 +1,146 @@
+"""Rate limiting for the white agent's LLM calls."""
+
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from collections import deque
+
+LLM_REQUESTS_PER_SECOND = float(os.getenv("LLM_REQUESTS_PER_SECOND", "0"))
+LLM_BURST = int(os.getenv("LLM_BURST", "5"))
+# After a rate-limit response: pause this long (unless the provider sends Retry-After),
+# halve the request rate down to at most LLM_MIN_REQUESTS_PER_SECOND, then add
+# LLM_RATE_STEP requests per second back after every successful call.
+LLM_BACKOFF_SECONDS = float(os.getenv("LLM_BACKOFF_SECONDS", "2"))
+LLM_MIN_REQUESTS_PER_SECOND = float(os.getenv("LLM_MIN_REQUESTS_PER_SECOND", "0.1"))
+LLM_RATE_STEP = float(os.getenv("LLM_RATE_STEP", "0.05"))
+# Window (seconds) over which the request rate is measured when no limit is set.
+RATE_WINDOW = 10.0
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, holding at most `capacity`.
+
+    A rate of 0 disables limiting. The rate adapts to the provider (AIMD): `backoff`
+    halves it on a rate-limit response and `recover` raises it again, up to the
+    configured rate.
+    """
+
+    def __init__(self, rate=LLM_REQUESTS_PER_SECOND, capacity=LLM_BURST, min_rate=LLM_MIN_REQUESTS_PER_SECOND,
+                 step=LLM_RATE_STEP):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate
+        self.step = step
+        self.capacity = max(1, capacity)
+        self.rate_limited = 0
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._granted = deque()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _note_grant(self, now):
+        self._granted.append(now)
+        while self._granted and self._granted[0] < now - RATE_WINDOW:
+            self._granted.popleft()
+
+    async def acquire(self):
+        if self.rate <= 0 and self._paused_until <= time.monotonic():
+            self._note_grant(time.monotonic())
+            return
+        # Waiters queue on the lock, so tokens are handed out in arrival order.
+        async with self._lock:
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            if self.rate > 0:
+                self._refill()
+                while self._tokens < 1:
+                    await asyncio.sleep((1 - self._tokens) / self.rate)
+                    self._refill()
+                self._tokens -= 1
+        self._note_grant(time.monotonic())
+
+    def backoff(self, retry_after=None):
+        """Pause requests and halve the rate after a rate-limit response."""
+        self.rate_limited += 1
+        now = time.monotonic()
+        if now < self._paused_until:
+            # Other requests from the same burst; the rate was already cut.
+            return
+        self._note_grant(now)
+        if self.rate > 0:
+            current = self.rate
+        else:
+            # No limit set: start from the rate requests were actually sent at.
+            current = len(self._granted) / max(now - self._granted[0], 1.0)
+        self._refill()
+        self.rate = max(self.min_rate, current / 2)
+        self._tokens = 0.0
+        self._paused_until = now + (retry_after if retry_after is not None else LLM_BACKOFF_SECONDS)
+
+    def recover(self):
+        """Raise a backed-off rate by one step after a successful call."""
+        if self.rate <= 0 or self.rate == self.max_rate:
+            return
+        self._refill()
+        self.rate += self.step
+        if self.max_rate > 0:
+            self.rate = min(self.rate, self.max_rate)
+
+
+class PriorityLimiter:
+    """Like asyncio.Semaphore(limit), but waiters are let in lowest `priority` first.
+
+    Waiters with equal priority are let in in arrival order.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self._waiters = []
+        self._order = itertools.count()
+
+    @property
+    def waiting(self):
+        return sum(not future.done() for _, _, future in self._waiters)
+
+    async def acquire(self, priority=math.inf):
+        if self.active < self.limit and not self.waiting:
+            self.active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we were cancelled; pass it on.
+                self.release()
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                # Hand the slot straight to the next waiter.
+                future.set_result(None)
+                return
+        self.active -= 1
+
+
+_buckets = {}
+
+
+def get_bucket(provider):
+    if provider not in _buckets:
+        _buckets[provider] = TokenBucket()
+    return _buckets[provider]
@@ -0,0 +1,33 @@
+"""Minimal UCI engine for tests: scores every position by the length of its FEN."""
+
+import sys
+
+STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+
+def score(fen):
+    """Centipawns from the side to move's point of view."""
+    return len(fen) % 50
+
+
+def main():
+    fen = STARTING_FEN
+    for line in sys.stdin:
+        command = line.strip()
+        if command == "uci":
+            print("id name stub\noption name Threads type spin default 1 min 1 max 512\n"
+                  "option name Hash type spin default 16 min 1 max 33554432\nuciok", flush=True)
+        elif command == "isready":
+            print("readyok", flush=True)
+        elif command.startswith("position fen "):
+            fen = command[len("position fen "):].split(" moves ")[0]
+        elif command.startswith("position startpos"):
+            fen = STARTING_FEN
+        elif command.startswith("go"):
+            print(f"info depth 1 score cp {score(fen)} nodes 1\nbestmove 0000", flush=True)
+        elif command == "quit":
+            break
+
+
+if __name__ == "__main__":
+    main()
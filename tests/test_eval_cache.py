@@ -0,0 +1,80 @@
+import sqlite3
+import threading
+import time
+import chess
+from src.my_util import eval_cache
+from src.my_util.eval_cache import EvalCache
+
+
+def positions(count):
+    """`count` distinct FENs: the start position with the white king moved around an empty board."""
+    fens = []
+    for square in chess.SQUARES[:count]:
+        board = chess.Board(None)
+        board.set_piece_at(square, chess.Piece(chess.KING, chess.WHITE))
+        board.set_piece_at(chess.H8 if square != chess.H8 else chess.A8, chess.Piece(chess.KING, chess.BLACK))
+        fens.append(board.fen())
+    return fens
+
+
+def test_hits_within_the_touch_interval_do_not_write(tmp_path):
+    cache = EvalCache(str(tmp_path / "cache.sqlite3"), touch_seconds=3600)
+    fen = chess.STARTING_FEN
+    cache.put(fen, 10, 0.3)
+    conn = cache._connection()
+    writes = conn.total_changes
+    assert all(cache.get(fen, 10) == 0.3 for _ in range(100))
+    assert conn.total_changes == writes
+    assert cache.stats()["hits"] == 100
+
+
+def test_concurrent_readers_are_not_blocked_by_a_writer(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = EvalCache(path, touch_seconds=3600)
+    fens = positions(8)
+    for i, fen in enumerate(fens):
+        cache.put(fen, 10, i / 10)
+
+    # Another process holds the write lock for the whole test.
+    writer = sqlite3.connect(path, isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+    writer.execute("INSERT INTO evals VALUES ('x', 1, 0.0, 0)")
+    results = {}
+
+    def read(index):
+        results[index] = [cache.get(fen, 10) for fen in fens]
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=read, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    writer.execute("ROLLBACK")
+
+    # A read that needed the write lock would wait out sqlite3's 5 second busy timeout.
+    assert elapsed < 2
+    assert all(values == [i / 10 for i in range(8)] for values in results.values())
+    assert len(cache._conns) == 5
+
+
+def test_eviction_drops_least_recently_touched_entries(tmp_path, monkeypatch):
+    clock = [1000]
+    monkeypatch.setattr(eval_cache.time, "time", lambda: clock[0])
+    cache = EvalCache(str(tmp_path / "cache.sqlite3"), max_entries=10, touch_seconds=60)
+    fens = positions(12)
+    for fen in fens[:10]:
+        cache.put(fen, 10, 0.0)
+    # The first entry is read after the touch interval, so it counts as recently used.
+    clock[0] += 60
+    assert cache.get(fens[0], 10) == 0.0
+    for fen in fens[10:]:
+        cache.put(fen, 10, 0.0)
+
+    # The 11th entry trims the cache to 90% of the bound (oldest first, ties in insertion
+    # order), and the 12th brings it back to 10.
+    assert cache.stats()["entries"] == 10
+    assert cache.get(fens[0], 10) == 0.0
+    assert [cache.get(fen, 10) for fen in fens[1:3]] == [None, None]
+    assert all(cache.get(fen, 10) == 0.0 for fen in fens[3:])
@@ -0,0 +1,140 @@
+import asyncio
+import chess
+import pytest
+from a2a.client import A2AClientTimeoutError
+from a2a.types import AgentCapabilities, AgentCard, AgentExtension
+from src.green_agent.clock import ChessClock
+from src.green_agent import green_agent_wrapper
+from src.green_agent.green_agent_wrapper import GreenAgent
+from src.my_util.my_a2a import GAME_OVER_EXTENSION
+
+
+class BlockingAnalysis:
+    """Stands in for AnalysisSession: every evaluation waits until cancelled."""
+
+    def __init__(self):
+        self.started = 0
+        self.cancelled = 0
+
+    async def analyse(self, board):
+        self.started += 1
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+
+def test_abort_cancels_every_pending_evaluation(tmp_path):
+    async def run():
+        agent = GreenAgent(output_dir=str(tmp_path), test_mode=False)
+        agent.analysis = BlockingAnalysis()
+        for _ in range(3):
+            agent._schedule_eval(chess.Board(), lambda move_eval: None)
+        await asyncio.sleep(0)
+        assert agent.analysis.started == 3
+        await agent.abort()
+        return agent
+
+    agent = asyncio.run(run())
+    assert agent.analysis.cancelled == 3
+    assert not agent._eval_tasks
+
+
+class RecordingA2A:
+    """Stands in for A2AClientManager: records each request's timeout, then hangs or times out."""
+
+    def __init__(self, hang=True):
+        self.hang = hang
+        self.timeouts = []
+        self.cancelled = 0
+
+    async def send_message(self, url, message, context_id=None, cur_timeout=None, metadata=None):
+        self.timeouts.append(cur_timeout)
+        if not self.hang:
+            raise A2AClientTimeoutError("Client Request timed out")
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+    async def aclose(self):
+        pass
+
+
+def play_first_move(tmp_path, a2a, move_deadline):
+    async def run():
+        clock = ChessClock(base=5000, move_deadline=move_deadline)
+        agent = GreenAgent(output_dir=str(tmp_path), clock=clock, test_mode=False)
+        agent.analysis = BlockingAnalysis()
+        agent.a2a = a2a
+        agent.register_agent("White", "http://white")
+        agent.register_agent("Black", "http://black")
+        result = await agent.execute(agent.pyspiel_state)
+        await agent.abort()
+        return agent, result
+
+    return asyncio.run(run())
+
+
+def test_request_is_cancelled_when_the_move_budget_runs_out(tmp_path):
+    a2a = RecordingA2A()
+    agent, result = play_first_move(tmp_path, a2a, move_deadline=0.05)
+    assert result is None
+    assert agent.forfeit_result == [0, 1]
+    assert a2a.timeouts[0] == pytest.approx(0.05, abs=0.01)
+    assert a2a.cancelled == 1
+
+
+def test_request_timeout_follows_budgets_over_the_client_default(tmp_path):
+    a2a = RecordingA2A(hang=False)
+    agent, result = play_first_move(tmp_path, a2a, move_deadline=1000)
+    assert a2a.timeouts[0] == pytest.approx(1000, abs=1)
+    # An HTTP timeout is a missed deadline, not an illegal move.
+    assert result is None
+    assert agent.forfeit_result == [0, 1]
+
+
+class GameOverA2A:
+    """Stands in for A2AClientManager: serves a card per URL and records game-over notices."""
+
+    def __init__(self, extensions, hang=()):
+        self.extensions = extensions
+        self.hang = hang
+        self.notified = []
+
+    async def get_agent_card(self, url):
+        return AgentCard(
+            name=url, description="", url=url, version="1.0.0",
+            default_input_modes=["text/plain"], default_output_modes=["text/plain"],
+            capabilities=AgentCapabilities(extensions=self.extensions.get(url)), skills=[],
+        )
+
+    async def send_message(self, url, message, context_id=None, cur_timeout=None, metadata=None):
+        self.notified.append(url)
+        if url in self.hang:
+            await asyncio.Event().wait()
+
+
+def test_game_over_goes_only_to_agents_that_support_it(tmp_path, monkeypatch):
+    monkeypatch.setattr(green_agent_wrapper, "GAME_OVER_TIMEOUT", 0.1)
+    a2a = GameOverA2A(
+        {"http://white": [AgentExtension(uri=GAME_OVER_EXTENSION)], "http://slow": [AgentExtension(uri=GAME_OVER_EXTENSION)]},
+        hang={"http://slow"},
+    )
+
+    async def run(black):
+        agent = GreenAgent(output_dir=str(tmp_path), test_mode=False)
+        agent.a2a = a2a
+        agent.register_agent("White", "http://white")
+        agent.register_agent("Black", black)
+        agent.agents["White_context_id"] = agent.agents["Black_context_id"] = "ctx"
+        await agent.end_conversations()
+
+    asyncio.run(run("http://third-party"))
+    assert a2a.notified == ["http://white"]
+
+    # A supporting agent that never answers is given up on after GAME_OVER_TIMEOUT.
+    asyncio.run(asyncio.wait_for(run("http://slow"), timeout=1))
+    assert a2a.notified[1:] == ["http://white", "http://slow"]
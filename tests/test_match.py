@@ -0,0 +1,37 @@
+import asyncio
+import pytest
+from src.match import Match, pair_stats, score_to_elo
+
+
+def play_match(results, stop="none"):
+    """Play a match where agent_a scores results[i] (0, 1/2 or 1) in game i."""
+    games = iter(results)
+
+    async def play_game(white, black, start_fen=None):
+        score_a = next(games)
+        return ((score_a, 1 - score_a) if white == "http://a" else (1 - score_a, score_a)), None, None
+
+    async def run():
+        match = Match("http://a", "http://b", max_pairs=len(results) // 2, stop=stop, play_game=play_game)
+        async for _ in match.run():
+            pass
+        return match
+
+    return asyncio.run(run())
+
+
+def test_report_gives_the_raw_score():
+    match = play_match([1, 1, 1, 0.5, 1, 0])
+    report = match.report()
+    assert report["points"] == {"http://a": 4.5, "http://b": 1.5}
+    assert report["score"] == 0.75
+    assert report["elo"] == round(score_to_elo(0.75), 1)
+    # The regularized mean the GSPRT uses is pulled towards 1/2.
+    assert pair_stats(match.pentanomial)[0] < 0.75
+
+
+def test_report_of_a_clean_sweep_is_a_full_score():
+    report = play_match([1, 1, 1, 1]).report()
+    assert report["score"] == 1.0
+    low, high = report["elo_interval"]
+    assert low < report["elo"] <= high
@@ -0,0 +1,83 @@
+import json
+import os
+import subprocess
+import sys
+import chess
+import chess.pgn
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUB_ENGINE = os.path.join(ROOT, "tests", "stub_uci.py")
+sys.path.insert(0, os.path.join(ROOT, "tests"))
+from stub_uci import score  # noqa: E402
+
+PGN = """[Event "Test"]
+[White "a"]
+[Black "b"]
+[Result "*"]
+
+1. e4 e5 2. Nf3 Nc6 3. Bb5 a6 *
+
+[Event "Test"]
+[White "b"]
+[Black "a"]
+[Result "*"]
+
+1. d4 d5 2. c4 e6 *
+"""
+
+
+def white_pawns(board):
+    # The stub scores from the side to move's point of view.
+    cp = score(board.fen())
+    return (cp if board.turn == chess.WHITE else -cp) / 100.0
+
+
+def run_in_subprocess(code, tmp_path, timeout=60):
+    """Run `code` in a fresh interpreter, failing the test if it does not exit in time."""
+    env = dict(os.environ, EVAL_CACHE_PATH=str(tmp_path / "eval_cache.sqlite3"), PYTHONPATH=ROOT)
+    try:
+        return subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env=env, timeout=timeout,
+                              capture_output=True, text=True, check=True)
+    except subprocess.TimeoutExpired:
+        pytest.fail(f"did not return within {timeout}s")
+
+
+def test_reanalyse_returns_and_writes_evals(tmp_path):
+    (tmp_path / "games.pgn").write_text(PGN)
+    engine = json.dumps([sys.executable, STUB_ENGINE])
+    run_in_subprocess(
+        "from src.reanalysis import reanalyse\n"
+        f"assert reanalyse('games.pgn', 'out', depth=1, workers=2, engine_path={engine}) == 2\n",
+        tmp_path,
+    )
+
+    with open(tmp_path / "out" / "games_reanalysis_d1.json") as f:
+        output = json.load(f)
+    game = chess.pgn.read_game(open(tmp_path / "games.pgn"))
+    board = game.board()
+    expected = [white_pawns(board)]
+    for move in game.mainline_moves():
+        board.push(move)
+        expected.append(white_pawns(board))
+    assert output["eval_history"] == pytest.approx(expected)
+
+
+def test_build_opening_index_returns_and_is_readable(tmp_path):
+    (tmp_path / "games.pgn").write_text(PGN)
+    engine = json.dumps([sys.executable, STUB_ENGINE])
+    run_in_subprocess(
+        "from src.reanalysis import build_opening_index\n"
+        f"build_opening_index('games.pgn', 'index.bin', plies=2, depth=3, workers=2, engine_path={engine})\n",
+        tmp_path,
+    )
+
+    from src.my_util.opening_index import OpeningIndex
+    index = OpeningIndex(str(tmp_path / "index.bin"))
+    after_e4 = chess.Board()
+    after_e4.push_san("e4")
+    # Start position, 1. e4, 1. d4, 1. e4 e5 and 1. d4 d5.
+    assert len(index) == 5
+    assert index.get(after_e4, depth=3) == pytest.approx(white_pawns(after_e4))
+    assert index.get(after_e4, depth=4) is None
+    assert index.stats() == {"hits": 1, "misses": 1, "entries": 5}
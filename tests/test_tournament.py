@@ -0,0 +1,34 @@
+import asyncio
+from collections import Counter
+from src.green_agent.session import active_sessions
+from src.tournament import Tournament, round_robin_pairings
+
+
+def test_round_robin_fills_every_slot_without_sharing_agents():
+    urls = [f"http://agent-{i}" for i in range(8)]
+    playing = Counter()
+    peak = {"games": 0, "sessions": 0}
+
+    async def play_game(white, black, session=None):
+        playing[white] += 1
+        playing[black] += 1
+        assert playing[white] == 1 and playing[black] == 1
+        running = sum(playing.values()) // 2
+        peak["games"] = max(peak["games"], running)
+        # Sessions are only opened for games that have started.
+        peak["sessions"] = max(peak["sessions"], len(active_sessions()))
+        assert len(active_sessions()) == running
+        await asyncio.sleep(0.01)
+        playing[white] -= 1
+        playing[black] -= 1
+        return [1, 0], {white: 1000.0, black: 1000.0}, None
+
+    async def run():
+        tournament = Tournament(urls, max_concurrency=4, per_agent_limit=1, play_game=play_game)
+        return [result async for result in tournament.run()], tournament
+
+    results, tournament = asyncio.run(run())
+    assert len(results) == len(round_robin_pairings(urls)) == 56
+    assert all(result["error"] is None for result in results)
+    assert peak == {"games": 4, "sessions": 4}
+    assert tournament.standings()[0][1] == 7.0